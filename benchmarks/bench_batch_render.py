@@ -0,0 +1,66 @@
+# bench_batch_render.py
+#
+# Throughput, in figures per second, of writing supply-and-demand graphs
+# for many markets to PNG files:
+#
+#   pyplot        -- standard_supply_and_demand_graph() for each market,
+#                    then savefig and plt.close
+#   frame         -- one market_frame reused for every market, in this process
+#   frame + pool  -- render_batch() over a process pool
+#
+# Use: python benchmarks/bench_batch_render.py [number of figures]
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+
+from delong_functions.render_functions import market_frame, render_batch
+
+
+def markets(count, directory, seed = 0):
+    "Render jobs for count random markets."
+    rng = np.random.default_rng(seed)
+    return [{"path": os.path.join(directory, f"market_{i:05d}.png"),
+             "maximum_willingness_to_pay": rng.uniform(8, 20),
+             "demand_slope": rng.uniform(0.5, 2),
+             "minimum_opportunity_cost": rng.uniform(0, 6),
+             "supply_slope": rng.uniform(0.5, 2),
+             "market_for_title": f"Lattes {i}"} for i in range(count)]
+
+
+def with_pyplot(jobs):
+    import matplotlib.pyplot as plt
+    from delong_functions.calc_and_graph_functions import standard_supply_and_demand_graph
+    for job in jobs:
+        job = dict(job)
+        path = job.pop("path")
+        fig, ax, equilibrium = standard_supply_and_demand_graph(**job, print_summary = False)
+        fig.savefig(path)
+        plt.close(fig)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cases = {
+        'pyplot': with_pyplot,
+        'frame': lambda jobs: render_batch(market_frame, jobs, workers = 1),
+        'frame + pool': lambda jobs: render_batch(market_frame, jobs),
+    }
+    for case, render in cases.items():
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = markets(count, directory)
+            start = time.perf_counter()
+            try:
+                render(jobs)
+            except Exception as error:
+                print(f'{case:>12}: failed -- {error!r}')
+                continue
+            elapsed = time.perf_counter() - start
+        print(f'{case:>12}: {count/elapsed:7.1f} figures/s ({elapsed:.2f} s for {count})')
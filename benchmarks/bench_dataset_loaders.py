@@ -0,0 +1,35 @@
+# bench_dataset_loaders.py
+#
+# Compares reading the bundled data files with a plain pd.read_csv call
+# (type inference, raw headers, no time index) against load_dataset():
+# on first use ("cold", parsing every column with declared dtypes and
+# building the time index), and once its columns have been parsed, for
+# all columns and for a single column.
+#
+# Use: python benchmarks/bench_dataset_loaders.py
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from delong_functions import dataset_functions
+from delong_functions.dataset_functions import DATASETS, DATA_DIRECTORY, load_dataset
+
+
+def best_time(statement, number = 200):
+    "Best time per call in milliseconds."
+    return min(timeit.repeat(statement, number = number, repeat = 5))/number*1e3
+
+
+if __name__ == '__main__':
+    for name, dataset in DATASETS.items():
+        path = os.path.join(DATA_DIRECTORY, dataset['file'])
+        one_column = [column for column in dataset['columns'] if column not in dataset['index']][-1]
+        cold = best_time(lambda: (dataset_functions._dataset_stores.clear(), load_dataset(name)))
+        print(f'{name:>22}: read_csv {best_time(lambda: pd.read_csv(path)):6.3f} ms, '
+              f'load_dataset cold {cold:6.3f} ms, warm {best_time(lambda: load_dataset(name)):6.3f} ms, '
+              f'one column {best_time(lambda: load_dataset(name, [one_column])):6.3f} ms')
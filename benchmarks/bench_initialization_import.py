@@ -0,0 +1,59 @@
+# bench_initialization_import.py
+#
+# Cold-start cost of delong_functions.initialization: each case runs in a
+# fresh interpreter, and reports the wall-clock time of the imports and
+# the peak resident set size of the process.
+#
+#   eager       -- every library the module used to import up front
+#   lazy        -- import delong_functions.initialization, touching nothing
+#   lazy + pd   -- the same, then use pandas only
+#
+# Use: python benchmarks/bench_initialization_import.py
+
+import os
+import subprocess
+import sys
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+EAGER = '''
+import matplotlib, matplotlib.pyplot, PIL, IPython.display, pandas, pandas_datareader
+import scipy, numpy, seaborn, statsmodels, statsmodels.api, statsmodels.formula.api
+'''
+
+CASES = {
+    'eager': EAGER,
+    'lazy': 'import delong_functions.initialization as init',
+    'lazy + pd': 'import delong_functions.initialization as init; init.pd.DataFrame',
+}
+
+TEMPLATE = '''
+import resource, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def cold_start(code, repeats = 5):
+    "Best time in seconds and peak RSS in MB over several fresh interpreters."
+    times, rss = [], []
+    for i in range(repeats):
+        result = subprocess.run([sys.executable, '-c', TEMPLATE.format(repo = REPO, code = code)],
+                                capture_output = True, text = True, check = True)
+        elapsed, maxrss = result.stdout.split()
+        times.append(float(elapsed))
+        rss.append(int(maxrss)/1024)
+    return min(times), min(rss)
+
+
+if __name__ == '__main__':
+    for case, code in CASES.items():
+        try:
+            elapsed, rss = cold_start(code)
+        except subprocess.CalledProcessError as error:
+            print(f'{case:>10}: failed -- {error.stderr.strip().splitlines()[-1]}')
+            continue
+        print(f'{case:>10}: {elapsed:6.3f} s, {rss:6.1f} MB peak RSS')
@@ -0,0 +1,130 @@
+# bench_model_state.py
+#
+# Measures the memory held per instance of the solow and malthusian
+# classes, the time taken to reset them to their initial state, and the
+# time of solow.generate_sequence(100):
+#
+#   before  -- copies, below, of the classes as they were when they kept
+#              their state in __dict__ and a copied dict of initial data,
+#              reset by setting every entry of that dict back
+#   after   -- the slotted classes in delong_classes
+#
+# Use: python benchmarks/bench_model_state.py
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+import delong_classes
+
+
+class solow_before:
+
+    "delong_classes.solow before it held its state in slots."
+
+    def __init__(self, n=0.01, s=0.20, δ=0.03, α=1/3, g=0.01, κ=0.2/(.01+.01+.03), E=1.0, L=1.0):
+        self.n, self.s, self.δ, self.α, self.g = n, s, δ, α, g
+        self.κ, self.E, self.L = κ, E, L
+        self.Y = self.κ**(self.α/(1-self.α))*self.E*self.L
+        self.K = self.κ * self.Y
+        self.y = self.Y/self.L
+        self.α1 = 1-((1-np.exp((self.α-1)*(self.n+self.g+self.δ)))/(self.n+self.g+self.δ))
+        self.initdata = vars(self).copy()
+
+    def reset(self):
+        # what generate_sequence and simulate did inline when init was true
+        for para in self.initdata:
+            setattr(self, para, self.initdata[para])
+
+    def calc_next_period_kappa(self):
+        n, s, δ, α1, g, κ= self.n, self.s, self.δ, self.α1, self.g, self.κ
+        return (κ + (1 - α1)*( s - (n+g+δ)*κ ))
+
+    def calc_next_period_E(self):
+        E, g = self.E, self.g
+        return (E * np.exp(g))
+
+    def calc_next_period_L(self):
+        n, L = self.n, self.L
+        return (L*np.exp(n))
+
+    def update(self):
+        self.κ =  self.calc_next_period_kappa()
+        self.E =  self.calc_next_period_E()
+        self.L =  self.calc_next_period_L()
+        self.Y = self.κ**(self.α/(1-self.α))*self.E*self.L
+        self.K = self.κ * self.Y
+        self.y = self.Y/self.L
+
+    def generate_sequence(self, T, var = 'κ', init = True):
+        path = []
+        if init == True:
+            self.reset()
+        for i in range(T):
+            path.append(vars(self)[var])
+            self.update()
+        return path
+
+
+class malthusian_before:
+
+    "delong_classes.malthusian before it held its state in slots."
+
+    def __init__(self, L = 1, E = 1/3, K = 3.0, β = 0.025, ϕ = 1, ysub = 1, h = 0, γ = 2.0,
+                 s = 0.15, α = 0.5, δ = 0.05):
+        self.L, self.E, self.K, self.h, self.γ, self.s, self.α, self.δ = L, E, K, h, γ, s, α, δ
+        self.β, self.ϕ, self.ysub = β, ϕ, ysub
+        self.Y = self.K**self.α*(self.E*self.L)**(1-self.α)
+        self.y = self.Y/self.L
+        self.κ = self.K/self.Y
+        self.n = self.β*((self.y/(self.ϕ*self.ysub)) - 1)
+        self.g = self.h-self.n/self.γ
+        self.initdata = vars(self).copy()
+
+    def reset(self):
+        # what simulate did inline when init was true
+        for para in self.initdata:
+            setattr(self, para, self.initdata[para])
+
+
+def bytes_per_instance(model_class, N = 100000):
+    "Average traced memory held by each of N freshly constructed models."
+    tracemalloc.start()
+    models = [model_class() for i in range(N)]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current/len(models)
+
+
+def reset_time(model_class, N = 100000):
+    "Average time in microseconds of one reset() call."
+    model = model_class()
+    start = time.perf_counter()
+    for i in range(N):
+        model.reset()
+    return (time.perf_counter() - start)/N*1e6
+
+
+def sequence_time(model_class, T = 100, N = 2000):
+    "Average time in microseconds of one generate_sequence(T) call."
+    model = model_class()
+    start = time.perf_counter()
+    for i in range(N):
+        model.generate_sequence(T)
+    return (time.perf_counter() - start)/N*1e6
+
+
+if __name__ == '__main__':
+    cases = {'solow': (solow_before, delong_classes.solow),
+             'malthusian': (malthusian_before, delong_classes.malthusian)}
+    for name, (before, after) in cases.items():
+        for label, model_class in ('before', before), ('after', after):
+            print(f'{name:>10} {label:>6}: {bytes_per_instance(model_class):6.0f} bytes per instance, '
+                  f'{reset_time(model_class):5.2f} µs per reset')
+    for label, model_class in ('before', solow_before), ('after', delong_classes.solow):
+        print(f'{"solow":>10} {label:>6}: {sequence_time(model_class):6.1f} µs per generate_sequence(100)')
@@ -1,9 +1,30 @@
 # delong_classes.py
 
+import hashlib
+import math
+import os
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from delong_functions.inequality_functions import grouped_gini
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _solow_output(κ, α, E, L):
+    """Output Y = κ^(α/(1-α)) E L, shared by solow and solow_batch. The power
+    is taken as exp(log) with numpy's ufuncs, which round a float scalar as
+    they round each entry of an array, and so one scenario of solow_batch
+    exactly as solow; float ** float need not (and is slower as np.power)."""
+    return np.exp(α/(1-α)*np.log(κ))*E*L
+
 class solow:
     
     """ 
@@ -17,6 +38,13 @@ class solow:
     <https://quantecon.org> class **Solow** 
     <https://lectures.quantecon.org/py/python_oop.html>
     """
+
+    variables = ['κ', 'E', 'L', 'Y', 'K', 'y']
+
+    # state is held in slots rather than a per-instance dict; a snapshot
+    # of it is a plain tuple of these fields
+    fields = ('n', 's', 'δ', 'α', 'g', 'κ', 'E', 'L', 'Y', 'K', 'y', 'α1')
+    __slots__ = fields + ('_init', 'scenario')
     
     def __init__(self, n=0.01,              # population growth rate
                        s=0.20,              # savings rate
@@ -29,11 +57,29 @@ class solow:
 
         self.n, self.s, self.δ, self.α, self.g = n, s, δ, α, g
         self.κ, self.E, self.L = κ, E, L
-        self.Y = self.κ**(self.α/(1-self.α))*self.E*self.L
+        self.Y = _solow_output(self.κ, self.α, self.E, self.L)
         self.K = self.κ * self.Y
         self.y = self.Y/self.L
         self.α1 = 1-((1-np.exp((self.α-1)*(self.n+self.g+self.δ)))/(self.n+self.g+self.δ))
-        self.initdata = vars(self).copy()
+        self._init = self.snapshot()
+
+    @property
+    def initdata(self):
+        "The initial state and parameters, as a dictionary."
+        return dict(zip(self.fields, self._init))
+
+    def snapshot(self):
+        "Return the current state and parameters as a tuple."
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def restore(self, snapshot):
+        "Restore the state and parameters saved by snapshot()."
+        for field, value in zip(self.fields, snapshot):
+            setattr(self, field, value)
+
+    def reset(self):
+        "Restore the initial state and parameters."
+        self.restore(self._init)
         
     def calc_next_period_kappa(self):
         "Calculate the next period capital-output ratio."
@@ -62,7 +108,7 @@ class solow:
         self.κ =  self.calc_next_period_kappa()
         self.E =  self.calc_next_period_E()
         self.L =  self.calc_next_period_L()
-        self.Y = self.κ**(self.α/(1-self.α))*self.E*self.L
+        self.Y = _solow_output(self.κ, self.α, self.E, self.L)
         self.K = self.κ * self.Y
         self.y = self.Y/self.L
 
@@ -79,14 +125,467 @@ class solow:
         
         # initialize data 
         if init == True:
-            for para in self.initdata:
-                 setattr(self, para, self.initdata[para])
+            self.reset()
 
         for i in range(T):
-            path.append(vars(self)[var])
+            path.append(getattr(self, var))
             self.update()
         return path
 
+    def simulate(self, T, init = True):
+        """Run the model once for T periods and return a dataframe indexed by t
+        with one column for each of κ, E, L, Y, K and y. Start from t=0 by default."""
+        path = np.empty((T, len(self.variables)))
+
+        # initialize data
+        if init == True:
+            self.reset()
+
+        for i in range(T):
+            path[i] = self.κ, self.E, self.L, self.Y, self.K, self.y
+            self.update()
+        return pd.DataFrame(path, columns = self.variables, index = pd.RangeIndex(T, name = 't'))
+
+    def _closed_form(self, t):
+        """Evaluate the exact solution of the update rule at dates t, starting
+        from the initial data:
+
+        κ_t = κ* + (κ_0 - κ*) (1 - (1-α1)(n+g+δ))^t
+        E_t = E_0 e^{g t},   L_t = L_0 e^{n t}
+        """
+        t = np.asarray(t, dtype = float)
+        # Unpack initial data (get rid of self to simplify notation)
+        init = self.initdata
+        n, s, δ, α, α1, g = init['n'], init['s'], init['δ'], init['α'], init['α1'], init['g']
+        κ_star = s/(n+g+δ)
+        κ = κ_star + (init['κ'] - κ_star)*(1 - (1-α1)*(n+g+δ))**t
+        E = init['E']*np.exp(g*t)
+        L = init['L']*np.exp(n*t)
+        y = κ**(α/(1-α))*E
+        Y = y*L
+        return {'κ': κ, 'E': E, 'L': L, 'Y': Y, 'K': κ*Y, 'y': y}
+
+    def at(self, t):
+        """Return a dictionary of the values of κ, E, L, Y, K and y at date t,
+        computed in closed form rather than by iterating update()."""
+        return {var: value.item() for var, value in self._closed_form(t).items()}
+
+    def path(self, ts):
+        """Return a dataframe indexed by the (possibly sparse) dates ts with the
+        closed-form values of κ, E, L, Y, K and y at each date."""
+        ts = np.asarray(ts)
+        return pd.DataFrame(self._closed_form(ts), index = pd.Index(ts, name = 't'))
+
+
+def _stochastic_solow_block(params, T, replications, seed, levels, block):
+    """Simulate a block of replications of stochastic_solow together and
+    return, for each of κ, y and Y, a (T x levels) array of the quantiles
+    of the cross-section at evenly spaced probabilities in every period."""
+    n, s, δ, α, g = params['n'], params['s'], params['δ'], params['α'], params['g']
+    σ_g, σ_s = params['σ_g'], params['σ_s']
+    rng = np.random.default_rng(seed)
+    grid = np.linspace(0, 1, levels)
+
+    κ = np.full(replications, float(params['κ']))
+    E = np.full(replications, float(params['E']))
+    L = float(params['L'])
+    sketches = {var: np.empty((T, levels)) for var in ('κ', 'y', 'Y')}
+    for t in range(T):
+        y = κ**(α/(1-α))*E
+        sketches['κ'][t] = np.quantile(κ, grid)
+        sketches['y'][t] = np.quantile(y, grid)
+        sketches['Y'][t] = np.quantile(y*L, grid)
+
+        # draw the productivity and savings shocks for the next block of periods at once
+        if t % block == 0:
+            ε_g = rng.standard_normal((block, replications))
+            ε_s = rng.standard_normal((block, replications))
+        g_t = g + σ_g*ε_g[t % block]
+        s_t = s + σ_s*ε_s[t % block]
+
+        # the solow update rule, with this period's g and s
+        α1 = 1-((1-np.exp((α-1)*(n+g_t+δ)))/(n+g_t+δ))
+        κ = κ + (1 - α1)*( s_t - (n+g_t+δ)*κ )
+        E = E*np.exp(g_t)
+        L = L*np.exp(n)
+    return sketches
+
+
+def _in_order(function, tasks, workers):
+    """Yield function(*task) for each task, in order, computed in this process
+    if workers is 1 and otherwise on a pool of that many processes with at
+    most two tasks per worker submitted ahead of the one being yielded."""
+    if workers == 1:
+        yield from (function(*task) for task in tasks)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(function, *task))
+            if len(pending) > 2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _interp_rows(x, xp, fp, upper):
+    """np.interp(x[t], xp[t], fp[t]) for every row t at once, given for each
+    entry of x the number upper of entries of its row of xp at or below it.
+    fp is shaped like xp, or one row shared by all."""
+    rows, k = xp.shape
+    upper = np.clip(upper, 1, k - 1)
+    if fp.ndim == 1:
+        f0, f1 = np.take(fp, upper - 1), np.take(fp, upper)
+    # index the rows as one flat vector: much faster than take_along_axis
+    upper += k*np.arange(rows)[:, None]
+    x0, x1 = np.take(xp, upper - 1), np.take(xp, upper)
+    if fp.ndim == 2:
+        f0, f1 = np.take(fp, upper - 1), np.take(fp, upper)
+    x1 -= x0
+    fraction = np.divide(x - x0, x1, out = np.ones_like(x1), where = x1 > 0)
+    np.clip(fraction, 0, 1, out = fraction)
+    f1 -= f0
+    f1 *= fraction
+    f1 += f0
+    return f1
+
+
+def _merge_rows_numpy(old, new, share, grid):
+    """Quantiles at grid of the mixture, with weight share on new, of the
+    distributions whose quantiles at grid, np.linspace(0, 1, levels), are
+    the rows of old and new: all rows at once, as stacks."""
+    T, levels = old.shape
+    rows = np.arange(T)[:, None]
+    pooled = np.concatenate([old, new], axis = 1)
+    # both halves of each row are sorted already, and a stable sort merges
+    # them quickly; the sorted position of each point, less its rank in its
+    # own sketch, counts the other sketch's points below it
+    order = np.argsort(pooled, axis = 1, kind = 'stable')
+    order += 2*levels*rows
+    position = np.empty_like(order)
+    position.ravel()[order.ravel()] = np.tile(np.arange(2*levels), T)
+    rank = np.arange(levels)
+    # each sketch's own points sit at the grid probabilities; the other's
+    # are interpolated, and the mixture cdf is the weighted sum
+    cdf = np.empty_like(pooled)
+    cdf[:, :levels] = (1 - share)*grid + share*_interp_rows(old, new, grid, position[:, :levels] - rank)
+    cdf[:, levels:] = (1 - share)*_interp_rows(new, old, grid, position[:, levels:] - rank) + share*grid
+    values, cdf = np.take(pooled, order), np.take(cdf, order)
+    # invert the cdf at grid: count each row's cdf values at or below each
+    # grid point (miscounting an exact tie does not change the quantile)
+    first = np.ceil(cdf*(levels - 1)).astype(np.intp)
+    first += (levels + 1)*rows
+    below = np.bincount(first.ravel(), minlength = T*(levels + 1)).reshape(T, levels + 1)
+    return _interp_rows(grid, cdf, values, np.cumsum(below[:, :levels], axis = 1))
+
+
+def _merge_rows(old, new, share, grid):
+    """_merge_rows_numpy() as one linear pass per row, walking the two sorted
+    rows together and emitting each grid quantile as the mixture cdf passes
+    it. Compiled by numba when it is available."""
+    T, levels = old.shape
+    out = np.empty_like(old)
+    for t in range(T):
+        a, b = old[t], new[t]
+        i = j = g = 0
+        previous_value = previous_cdf = 0.0
+        for step in range(2*levels):
+            # the next pooled point: its own sketch's cdf there is a grid
+            # probability, and the other's is interpolated between the
+            # other's neighbouring points
+            if j == levels or (i < levels and a[i] <= b[j]):
+                value = a[i]
+                k = min(max(j, 1), levels - 1)
+                x0, x1 = b[k - 1], b[k]
+                own_share, own = 1 - share, grid[i]
+                i += 1
+            else:
+                value = b[j]
+                k = min(max(i, 1), levels - 1)
+                x0, x1 = a[k - 1], a[k]
+                own_share, own = share, grid[j]
+                j += 1
+            fraction = 1.0 if x1 <= x0 else min(max((value - x0)/(x1 - x0), 0.0), 1.0)
+            cdf = own_share*own + (1 - own_share)*(grid[k - 1] + fraction*(grid[k] - grid[k - 1]))
+            while g < levels and grid[g] <= cdf:
+                if step == 0 or cdf <= previous_cdf:
+                    out[t, g] = value
+                else:
+                    out[t, g] = previous_value + (grid[g] - previous_cdf)/(cdf - previous_cdf)*(value - previous_value)
+                g += 1
+            previous_value, previous_cdf = value, cdf
+        while g < levels:
+            out[t, g] = previous_value
+            g += 1
+    return out
+
+# compile the merge loop when numba is available; otherwise merge with the
+# vectorized numpy version
+if njit is not None:
+    _merge_rows = njit(cache = True)(_merge_rows)
+else:
+    _merge_rows = _merge_rows_numpy
+
+
+def _merge_sketches(merged, weight, sketch, size, grid):
+    """Fold a block's quantile sketch (for each of κ, y and Y, a T x levels
+    array of quantiles at the evenly spaced probabilities grid) into the
+    running sketch merged, which summarizes weight paths, and return the
+    result: the quantiles at grid of the mixture of the two distributions."""
+    if merged is None:
+        return sketch
+    return {var: _merge_rows(old, sketch[var], size/(weight + size), grid) for var, old in merged.items()}
+
+
+class stochastic_solow(solow):
+
+    """
+    The Solow growth model with random shocks: each period the
+    productivity growth rate is g + σ_g ε_g and the savings rate is
+    s + σ_s ε_s, with ε_g and ε_s independent standard normals, and
+    κ, E and L follow the solow update rule given those draws.
+
+    monte_carlo() runs many replications, split into blocks that are
+    farmed out to a process pool, and returns period-by-period quantiles
+    of κ, y and Y rather than every path.
+    """
+
+    fields = solow.fields + ('σ_g', 'σ_s')
+    __slots__ = ('σ_g', 'σ_s')
+
+    def __init__(self, σ_g = 0.01,          # standard deviation of shocks to g
+                       σ_s = 0.02,          # standard deviation of shocks to s
+                       **kwargs):           # parameters and initial state, as for solow
+        self.σ_g, self.σ_s = σ_g, σ_s
+        super().__init__(**kwargs)
+
+    def monte_carlo(self, T, replications = 10000, quantiles = (0.05, 0.5, 0.95),
+                    seed = None, workers = None, chunk = 2500, levels = 201, block = 64):
+        """Simulate replications paths of T periods from the initial data and
+        return a dataframe indexed by t of the selected quantiles of κ, y and Y.
+
+        Replications are split into blocks of at most chunk paths; each block
+        gets its own random stream spawned from seed, so results do not depend
+        on the number of workers, and blocks run on a pool of that many
+        processes (in this process if workers is 1). Memory is bounded by the
+        block size, not the number of replications: each block returns only
+        levels quantiles per period, and these are folded into one running
+        set of levels quantiles as blocks finish, from which the requested
+        ones are read, accurate to about 1/levels in probability."""
+        params = self.initdata
+        sizes = [min(chunk, replications - start) for start in range(0, replications, chunk)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        tasks = [(params, T, size, seq, levels, block) for size, seq in zip(sizes, seeds)]
+
+        # fold each block's sketch into a running one as it arrives, in task
+        # order (so the result does not depend on the number of workers),
+        # keeping only a few blocks in flight at a time
+        grid = np.linspace(0, 1, levels)
+        merged, weight = None, 0
+        for size, sketch in zip(sizes, _in_order(_stochastic_solow_block, tasks, workers)):
+            merged = _merge_sketches(merged, weight, sketch, size, grid)
+            weight += size
+
+        summary = {}
+        for var in ('κ', 'y', 'Y'):
+            for q in np.asarray(quantiles, dtype = float):
+                summary[(var, q)] = [np.interp(q, grid, merged[var][t]) for t in range(T)]
+        return pd.DataFrame(summary, index = pd.RangeIndex(T, name = 't'))
+
+
+class shock:
+
+    """
+    A timed change to a parameter or state variable of a batched
+    simulation. At the start of period t, before that period is
+    recorded, the variable var is set to value (how = 'set'), multiplied
+    by it (how = 'scale') or increased by it (how = 'add'). value may be
+    a scalar or an array with one entry per scenario hit; scenarios
+    (an index array, boolean mask or slice) restricts the shock to some
+    scenarios, and by default hits all of them. For example, a plague
+    that carries off a third of the population in year 250:
+
+        shock(250, 'L', 2/3, how = 'scale')
+    """
+
+    def __init__(self, t, var, value, how = 'set', scenarios = None):
+        if how not in ('set', 'scale', 'add'):
+            raise ValueError(f"how must be 'set', 'scale' or 'add', not {how!r}")
+        # Python stores identifiers NFKC-normalized, so the attribute for the
+        # keyword ϕ (U+03D5) is φ (U+03C6); normalize var the same way
+        var = unicodedata.normalize('NFKC', var)
+        self.t, self.var, self.value, self.how, self.scenarios = t, var, value, how, scenarios
+
+    def apply(self, model):
+        "Apply the shock to the current state of a batched model."
+        if self.var not in model.shockable:
+            raise ValueError(f"cannot shock {self.var!r}; choose one of {model.shockable}")
+        current = vars(model)[self.var]
+        hit = slice(None) if self.scenarios is None else self.scenarios
+        new = current.copy()
+        if self.how == 'set':
+            new[hit] = self.value
+        elif self.how == 'scale':
+            new[hit] = current[hit]*self.value
+        else:
+            new[hit] = current[hit] + self.value
+        setattr(model, self.var, new)
+
+    @staticmethod
+    def schedule(shocks):
+        "Group shocks into a dictionary keyed by the period in which they hit."
+        timetable = {}
+        for event in shocks:
+            timetable.setdefault(event.t, []).append(event)
+        return timetable
+
+    @staticmethod
+    def apply_all(model, shocks):
+        """Apply several shocks hitting in the same period, then recalculate
+        the model variables that depend on the shocked ones."""
+        for event in shocks:
+            event.apply(model)
+        model.recalculate()
+
+
+class solow_batch:
+
+    """
+    Vectorized version of class solow that advances many economies
+    at once. Every parameter and initial condition may be a scalar or
+    an array; they are broadcast against one another and flattened, so
+    that scenario i is the i-th element of the broadcast arrays. Each
+    scenario follows exactly the same update rule as solow:
+
+    κ_{t+1} = κ_t + ( 1 - α1) ( s - (n+g+δ)κ_t )
+
+    and generate_sequence returns a (scenarios x T) array. Timed shocks
+    to any of the variables in shockable can be passed to simulate and
+    generate_sequence as a list of shock objects.
+    """
+
+    variables = ['κ', 'E', 'L', 'Y', 'K', 'y']
+    shockable = ['n', 's', 'δ', 'α', 'g', 'κ', 'E', 'L']
+
+    def __init__(self, n=0.01,              # population growth rates
+                       s=0.20,              # savings rates
+                       δ=0.03,              # depreciation rates
+                       α=1/3,               # shares of capital
+                       g=0.01,              # productivity growth rates
+                       κ=0.2/(.01+.01+.03), # current capital-output ratios
+                       E=1.0,               # current efficiencies of labor
+                       L=1.0):              # current labor forces
+
+        n, s, δ, α, g, κ, E, L = [np.array(x, dtype = float).ravel() for x in
+            np.broadcast_arrays(n, s, δ, α, g, κ, E, L)]
+        self.n, self.s, self.δ, self.α, self.g = n, s, δ, α, g
+        self.κ, self.E, self.L = κ, E, L
+        self.recalculate()
+        self.initdata = {para: value.copy() for para, value in vars(self).items()}
+
+    def __len__(self):
+        "Number of scenarios."
+        return len(self.κ)
+
+    def recalculate(self):
+        "Recalculate Y, K, y and α1 from the current κ, E, L and parameters."
+        self.Y = _solow_output(self.κ, self.α, self.E, self.L)
+        self.K = self.κ * self.Y
+        self.y = self.Y/self.L
+        self.α1 = 1-((1-np.exp((self.α-1)*(self.n+self.g+self.δ)))/(self.n+self.g+self.δ))
+
+    def calc_next_period_kappa(self):
+        "Calculate the next period capital-output ratios."
+        n, s, δ, α1, g, κ = self.n, self.s, self.δ, self.α1, self.g, self.κ
+        return (κ + (1 - α1)*( s - (n+g+δ)*κ ))
+
+    def calc_next_period_E(self):
+        "Calculate the next period efficiencies of labor."
+        E, g = self.E, self.g
+        return (E * np.exp(g))
+
+    def calc_next_period_L(self):
+        "Calculate the next period labor forces."
+        n, L = self.n, self.L
+        return (L*np.exp(n))
+
+    def update(self):
+        "Update the current state of every scenario."
+        self.κ =  self.calc_next_period_kappa()
+        self.E =  self.calc_next_period_E()
+        self.L =  self.calc_next_period_L()
+        self.Y = _solow_output(self.κ, self.α, self.E, self.L)
+        self.K = self.κ * self.Y
+        self.y = self.Y/self.L
+
+    def steady_state(self):
+        "Compute the steady state values of the capital-output ratios."
+        n, s, δ, g = self.n, self.s, self.δ, self.g
+        return (s /(n + g + δ))
+
+    def reset(self):
+        "Restore every scenario to its initial state."
+        for para in self.initdata:
+            setattr(self, para, self.initdata[para].copy())
+
+    def simulate(self, T, init = True, shocks = ()):
+        """Run every scenario for T periods, applying any scheduled shocks, and
+        return a dictionary mapping each of κ, E, L, Y, K and y to a
+        (scenarios x T) array."""
+        if init == True:
+            self.reset()
+        timetable = shock.schedule(shocks)
+
+        # fill period-major arrays so that each write is contiguous
+        paths = {var: np.empty((T, len(self))) for var in self.variables}
+        for i in range(T):
+            if i in timetable:
+                shock.apply_all(self, timetable[i])
+            for var in self.variables:
+                paths[var][i] = vars(self)[var]
+            self.update()
+        return {var: path.T for var, path in paths.items()}
+
+    def generate_sequence(self, T, var = 'κ', init = True, shocks = ()):
+        """Generate and return a (scenarios x T) array of the selected
+        variable, applying any scheduled shocks. Variable is κ by default.
+        Start from t=0 by default."""
+        if init == True:
+            self.reset()
+        timetable = shock.schedule(shocks)
+
+        path = np.empty((T, len(self)))
+        for i in range(T):
+            if i in timetable:
+                shock.apply_all(self, timetable[i])
+            path[i] = vars(self)[var]
+            self.update()
+        return path.T
+
+
+def _malthusian_kernel(out, K, L, E, Y, y, κ, n, g, s, δ, α, β, ϕ, ysub, h, γ):
+    """Fill out (periods x 8) with the path of K, L, E, Y, y, κ, n and g from
+    the given current state, applying malthusian.update once per period,
+    and return the state reached after the last period."""
+    for i in range(out.shape[0]):
+        out[i, 0], out[i, 1], out[i, 2], out[i, 3] = K, L, E, Y
+        out[i, 4], out[i, 5], out[i, 6], out[i, 7] = y, κ, n, g
+        K = s*Y + (1-δ)*K
+        L = L*math.exp(n)
+        E = E*math.exp(g)
+        Y = K**α*(E*L)**(1-α)
+        y = Y/L
+        κ = K/Y
+        n = β*(y/(ϕ*ysub)-1)
+        g = h-n/γ
+    return K, L, E, Y, y, κ, n, g
+
+# compile the single-trajectory loop when numba is available; otherwise
+# fall back to the same loop in pure Python
+if njit is not None:
+    _malthusian_kernel = njit(cache = True)(_malthusian_kernel)
+
 
 class malthusian:
     
@@ -99,6 +598,14 @@ class malthusian:
     2. growth of efficiency-of-labor 
         g = h-n/γ
     """
+
+    variables = ['K', 'L', 'E', 'Y', 'y', 'κ', 'n', 'g']
+
+    # state is held in slots rather than a per-instance dict; a snapshot
+    # of it is a plain tuple of these fields
+    fields = ('L', 'E', 'K', 'h', 'γ', 's', 'α', 'δ', 'β', 'φ', 'ysub', 'Y', 'y', 'κ', 'n', 'g')
+    __slots__ = fields + ('_init', 'scenario', 'mal_κ', 'mal_n', 'mal_y', 'mal_E')
+
     def __init__(self,
                  L = 1,               # initial labor force
                  E = 1/3,             # initial efficiency of labor
@@ -134,7 +641,25 @@ class malthusian:
         self.g = self.h-self.n/self.γ
         
         # store initial data
-        self.initdata = vars(self).copy()
+        self._init = self.snapshot()
+
+    @property
+    def initdata(self):
+        "The initial state and parameters, as a dictionary."
+        return dict(zip(self.fields, self._init))
+
+    def snapshot(self):
+        "Return the current state and parameters as a tuple."
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def restore(self, snapshot):
+        "Restore the state and parameters saved by snapshot()."
+        for field, value in zip(self.fields, snapshot):
+            setattr(self, field, value)
+
+    def reset(self):
+        "Restore the initial state and parameters."
+        self.restore(self._init)
     
     def update(self):
         # unpack parameters
@@ -155,44 +680,650 @@ class malthusian:
         self.K, self.s, self.Y, self.δ, self.L, self.n, self.E, self.g, self.α = K, s, Y, δ, L, n, E, g, α
         self.κ, self.y = κ, y
         
-    def gen_seq(self, t, var = 'κ', init = True, log = False):
-        "Generate and return time series of selected variable. Variable is κ by default."
-        
-        path = []
-        
+    def simulate(self, t, init = True):
+        """Run the model once for t periods and return a trajectory holding
+        every state variable, so that a grid of figures can draw all of its
+        panels from the same run."""
+
         # initialize data 
         if init == True:
-            for para in self.initdata:
-                 setattr(self, para, self.initdata[para])
+            self.reset()
 
-        for i in range(t):
-            path.append(vars(self)[var])
-            self.update()
+        # column-major, so that every variable's path is contiguous
+        path = np.empty((t, len(self.variables)), order = 'F')
+        state = _malthusian_kernel(path, *[float(x) for x in (self.K, self.L, self.E, self.Y,
+            self.y, self.κ, self.n, self.g, self.s, self.δ, self.α, self.β, self.ϕ, self.ysub, self.h, self.γ)])
+        for var_name, value in zip(self.variables, state):
+            setattr(self, var_name, value)
+        return trajectory(path, self.variables)
+
+    def gen_seq(self, t, var = 'κ', init = True, log = False):
+        "Generate and return time series of selected variable. Variable is κ by default."
+        
+        path = self.simulate(t, init = init)
         
         if log == False:
-            return path
+            return path[var].tolist()
         else:
-            return np.log(np.asarray(path))
+            return path.log(var)
+
+    def compare(self, data, start, end, var = 'L', normalize = True):
+        "Simulate from start to end and set var beside a long_run_series; see long_run_series.compare."
+        return data.compare(self, start, end, var = var, normalize = normalize)
 
     def steady_state(self, disp = True):
         "Calculate variable values in the steady state"
         #unpack parameters
         s, γ, h, δ, ϕ, ysub, β, α= self.s, self.γ, self.h, self.δ, self.ϕ, self.ysub, self.β, self.α
         
-        self.mal_κ = s/(γ*h+δ)
+        # the fixed point of update(), as in malthusian_steady_states()
+        self.mal_κ = s/(np.exp(γ*h)-1+δ)
         # malthusian rate of population growth
         self.mal_n = γ*h
         # malthusian standard of living
-        self.mal_y = ϕ*(ysub+γ*h/β)
-        self.mal_E = self.mal_y*((γ*h+δ)/s)**(α/(1-α))
+        self.mal_y = ϕ*ysub*(1+γ*h/β)
+        self.mal_E = self.mal_y*self.mal_κ**(-α/(1-α))
         
-        if display == True:
-            return(f'steady-state capital-output ratio κ: {self.mal_κ:.2f}')
-            return(f'Malthusian rate of population growth n: {self.mal_n: .2f}')
-            return(f'Malthusian standard of living y: {self.mal_y:.2f}')
-            return(f'steady-state efficiency-of-labor E: {self.mal_E:.2f}') 
-        else: 
-            return(self.mal_κ,self.mal_n,self.mal_y,self.mal_E)
+        if disp == True:
+            print(f'steady-state capital-output ratio κ: {self.mal_κ:.2f}')
+            print(f'Malthusian rate of population growth n: {self.mal_n: .2f}')
+            print(f'Malthusian standard of living y: {self.mal_y:.2f}')
+            print(f'steady-state efficiency-of-labor E: {self.mal_E:.2f}') 
+        return(self.mal_κ,self.mal_n,self.mal_y,self.mal_E)
+
+
+
+class trajectory:
+
+    """
+    The path of every state variable of one simulation run, held in a
+    single (periods x variables) float array. Columns are returned as
+    views into that array, and their logs are computed on first request
+    and then kept:
+
+        run = m.simulate(T)
+        run['κ'], run.log('L'), run.series('Y', log = True)
+    """
+
+    def __init__(self, data, variables):
+        self.data = data
+        self.variables = list(variables)
+        self._logs = {}
+
+    def __len__(self):
+        "Number of periods."
+        return self.data.shape[0]
+
+    def __getitem__(self, var):
+        "Return a view of the path of the selected variable."
+        return self.data[:, self.variables.index(var)]
+
+    def log(self, var):
+        "Return the log of the path of the selected variable, computing it only once."
+        if var not in self._logs:
+            self._logs[var] = np.log(self[var])
+        return self._logs[var]
+
+    def series(self, var, log = False):
+        "Return the path of the selected variable, or of its log if log is True."
+        if log == False:
+            return self[var]
+        else:
+            return self.log(var)
+
+    def to_frame(self):
+        "Return the run as a dataframe indexed by t."
+        return pd.DataFrame(self.data, columns = self.variables, index = pd.RangeIndex(len(self), name = 't'))
+
+
+class malthusian_batch:
+
+    """
+    Vectorized version of class malthusian that steps many
+    parameterizations at once. Every parameter and initial condition
+    may be a scalar or an array; they are broadcast against one another
+    and flattened, so that scenario i is the i-th element of the
+    broadcast arrays. Paths are written into preallocated
+    (scenarios x t) arrays. Timed shocks to any of the variables in
+    shockable -- a plague, a jump in h -- can be passed to simulate and
+    gen_seq as a list of shock objects.
+    """
+
+    variables = ['K', 'L', 'E', 'Y', 'y', 'κ', 'n', 'g']
+    shockable = ['L', 'E', 'K', 'β', 'φ', 'ysub', 'h', 'γ', 's', 'α', 'δ']
+
+    def __init__(self,
+                 L = 1,               # initial labor forces
+                 E = 1/3,             # initial efficiencies of labor
+                 K = 3.0,             # initial capital stocks
+                 β = 0.025,           # responsiveness of population growth to increased prosperity
+                 ϕ = 1,               # luxuries parameters
+                 ysub = 1,            # subsistence levels
+                 h = 0,               # rates at which useful ideas are generated
+                 γ = 2.0,             # effect-of-resource scarcity parameters
+                 s = 0.15,            # savings-investment rates
+                 α = 0.5,             # orientation-of-growth-toward-capital parameters
+                 δ = 0.05,            # deprecation rates on capital
+                ):
+        L, E, K, β, ϕ, ysub, h, γ, s, α, δ = [np.array(x, dtype = float).ravel() for x in
+            np.broadcast_arrays(L, E, K, β, ϕ, ysub, h, γ, s, α, δ)]
+        self.L, self.E, self.K, self.h, self.γ, self.s, self.α, self.δ = L, E, K, h, γ, s, α, δ
+        self.β, self.ϕ, self.ysub = β, ϕ, ysub
+        self.recalculate()
+        self.initdata = {para: value.copy() for para, value in vars(self).items()}
+
+    def __len__(self):
+        "Number of scenarios."
+        return len(self.K)
+
+    def recalculate(self):
+        "Recalculate Y, y, κ, n and g from the current K, L, E and parameters."
+        self.Y = self.K**self.α*(self.E*self.L)**(1-self.α)
+        self.y = self.Y/self.L
+        self.κ = self.K/self.Y
+        self.n = self.β*((self.y/(self.ϕ*self.ysub)) - 1)
+        self.g = self.h-self.n/self.γ
+
+    def reset(self):
+        "Restore every scenario to its initial state."
+        for para in self.initdata:
+            setattr(self, para, self.initdata[para].copy())
+
+    def update(self):
+        "Advance every scenario by one period."
+        K, s, Y, δ, L, n, E, g, α = self.K, self.s, self.Y, self.δ, self.L, self.n, self.E, self.g, self.α
+        β, ϕ, ysub, h, γ = self.β, self.ϕ, self.ysub, self.h, self.γ
+
+        K = s*Y + (1-δ)*K
+        L = L*np.exp(n)
+        E = E*np.exp(g)
+        Y = K**α*(E*L)**(1-α)
+        y = Y/L
+        κ = K/Y
+        n = β*(y/(ϕ*ysub)-1)
+        g = h-n/γ
+
+        self.K, self.L, self.E, self.Y, self.y, self.κ, self.n, self.g = K, L, E, Y, y, κ, n, g
+
+    def simulate(self, t, init = True, shocks = ()):
+        """Run every scenario for t periods, applying any scheduled shocks, and
+        return a dictionary mapping each of K, L, E, Y, y, κ, n and g to a
+        (scenarios x t) array."""
+        if init == True:
+            self.reset()
+        timetable = shock.schedule(shocks)
+
+        # fill period-major arrays so that each write is contiguous
+        paths = {var: np.empty((t, len(self))) for var in self.variables}
+        for i in range(t):
+            if i in timetable:
+                shock.apply_all(self, timetable[i])
+            for var in self.variables:
+                paths[var][i] = vars(self)[var]
+            self.update()
+        return {var: path.T for var, path in paths.items()}
+
+    def gen_seq(self, t, var = 'κ', init = True, log = False, shocks = ()):
+        """Generate and return a (scenarios x t) array of the selected variable,
+        applying any scheduled shocks. Variable is κ by default."""
+        if init == True:
+            self.reset()
+        timetable = shock.schedule(shocks)
+
+        path = np.empty((t, len(self)))
+        for i in range(t):
+            if i in timetable:
+                shock.apply_all(self, timetable[i])
+            path[i] = vars(self)[var]
+            self.update()
+
+        if log == False:
+            return path.T
+        else:
+            return np.log(path, out = path).T
+
+
+
+def solow_steady_states(n=0.01, s=0.20, δ=0.03, α=1/3, g=0.01, κ=None, E=1.0, tol=0.01):
+    """
+    Steady states and convergence speeds of the solow model for arrays
+    of parameters, which are broadcast against one another. The update
+    rule is linear in κ, so everything is in closed form: the gap to
+    κ* = s/(n+g+δ) shrinks by the factor ρ = 1 - (1-α1)(n+g+δ) each
+    period, which gives the half-life, and, if initial capital-output
+    ratios κ are given, the number of periods until κ is within tol
+    (proportionally) of κ*. y_star is output per worker on the balanced
+    growth path when the efficiency of labor is E.
+
+    Returns a dataframe with one row per parameter set.
+    """
+    n, s, δ, α, g, E = [np.array(x, dtype = float).ravel() for x in np.broadcast_arrays(n, s, δ, α, g, E)]
+    α1 = 1-((1-np.exp((α-1)*(n+g+δ)))/(n+g+δ))
+    ρ = 1 - (1-α1)*(n+g+δ)
+    κ_star = s/(n+g+δ)
+    steady = pd.DataFrame({'n': n, 's': s, 'δ': δ, 'α': α, 'g': g,
+        'κ_star': κ_star, 'y_star': κ_star**(α/(1-α))*E,
+        'half_life': np.log(0.5)/np.log(ρ)})
+    if κ is not None:
+        gap = np.abs(np.broadcast_to(np.asarray(κ, dtype = float), κ_star.shape) - κ_star)/κ_star
+        with np.errstate(divide = 'ignore'):
+            periods = np.ceil(np.log(tol/gap)/np.log(ρ))
+        steady['periods_to_tol'] = np.where(gap <= tol, 0, periods)
+    return steady
+
+
+# parameters calibrate_solow() can fit, and the default ranges it searches
+solow_calibration_bounds = {'s': (0.01, 0.6), 'n': (0.0, 0.05), 'g': (0.0, 0.06),
+                            'δ': (0.005, 0.15), 'α': (0.05, 0.9), 'κ': (0.1, 20.0)}
+
+
+def _solow_log_output(θ, names, fixed, t):
+    """log Y_t - log(E_0 L_0) of the solow model in closed form, for a
+    population of parameter vectors θ (one row per candidate, one column
+    per name in names; other parameters from fixed), and its derivatives
+    with respect to each of names. With λ = n+g+δ the update rule gives
+
+    κ_t = κ* + (κ_0 - κ*) D_t,  κ* = s/λ,  D_t = e^{-(1-α) λ t}
+    log Y_t = α/(1-α) log κ_t + (n+g) t + log(E_0 L_0)
+    """
+    p = {name: θ[:, names.index(name), None] if name in names else fixed[name]
+         for name in ('s', 'n', 'g', 'δ', 'α', 'κ')}
+    s, n, g, δ, α, κ0 = p['s'], p['n'], p['g'], p['δ'], p['α'], p['κ']
+    λ = n + g + δ
+    a = α/(1-α)
+    κ_star = s/λ
+    D = np.exp(-(1-α)*λ*t)
+    κ = κ_star + (κ0 - κ_star)*D
+    log_Y = a*np.log(κ) + (n+g)*t
+
+    # d log Y/d κ_t times the derivative of κ_t with respect to each parameter
+    dκ_dλ = -κ_star/λ*(1-D) - (κ0 - κ_star)*(1-α)*t*D
+    derivatives = {'s': a/κ*(1-D)/λ,
+                   'δ': a/κ*dκ_dλ,
+                   'n': a/κ*dκ_dλ + t,
+                   'g': a/κ*dκ_dλ + t,
+                   'α': np.log(κ)/(1-α)**2 + a/κ*(κ0 - κ_star)*λ*t*D,
+                   'κ': a/κ*D}
+    return log_Y, [np.broadcast_to(derivatives[name], log_Y.shape) for name in names]
+
+
+def _solow_calibration_loss(θ, names, fixed, t, log_data):
+    """Mean squared log error of each candidate in θ against the data, with
+    the level log(E_0 L_0) chosen optimally (so residuals are demeaned), and
+    its gradient."""
+    log_Y, derivatives = _solow_log_output(θ, names, fixed, t)
+    residual = log_data - log_Y
+    residual -= residual.mean(axis = 1, keepdims = True)
+    loss = (residual**2).mean(axis = 1)
+    gradient = np.stack([-2*(residual*derivative).mean(axis = 1) for derivative in derivatives], axis = 1)
+    return loss, gradient
+
+
+def _solow_calibration_start(θ0, names, fixed, t, log_data, bounds):
+    "One L-BFGS-B run from θ0, with analytic gradients."
+    from scipy.optimize import minimize
+
+    def objective(x):
+        loss, gradient = _solow_calibration_loss(x[None], names, fixed, t, log_data)
+        return loss[0], gradient[0]
+
+    result = minimize(objective, θ0, jac = True, method = 'L-BFGS-B', bounds = bounds)
+    return result.x, result.fun, result.success
+
+
+def calibrate_solow(data = None, free = ('g', 'δ', 'κ'), model = None, bounds = None,
+                    population = 4096, starts = 8, seed = None, workers = None):
+    '''
+    Fit parameters of the solow model to a series of real output, by least
+    squares on log output. The model is evaluated in closed form for a whole
+    population of candidate parameter vectors at once; the best candidates
+    then seed L-BFGS-B runs with analytic gradients, run in parallel.
+
+    The level of output, log(E_0 L_0), is always fitted (in closed form).
+    Output alone pins down only n + g, so fit n or g, not both; and scaling
+    s and κ together only shifts the level of output, so fit one of them.
+    The rest are held at the values in model.
+
+    Parameters
+    ==========
+
+    data : pandas series (optional)
+        real output, indexed by a quarterly (or monthly or annual)
+        PeriodIndex, or by numbers of years; default real GDP from the
+        bundled Quarterly_Accounts.csv. Dates become years since the first
+        observation: quarter i is year i/4
+    free : tuple of strings (optional)
+        the parameters to fit, from s, n, g, δ, α and κ (the initial
+        capital-output ratio); default ('g', 'δ', 'κ')
+    model : solow (optional)
+        supplies the parameters not fitted; default solow()
+    bounds : dict (optional)
+        search range for each free parameter; default solow_calibration_bounds
+    population : int (optional)
+        number of random candidates evaluated together; default 4096
+    starts : int (optional)
+        number of best candidates to refine with L-BFGS-B; default 8
+    seed : int (optional)
+        seed for drawing the candidates; default none
+    workers : int (optional)
+        number of processes for the L-BFGS-B runs; default os.cpu_count(),
+        and 1 runs them in this process
+
+    Returns
+    =======
+
+    calibration : dict
+        "params"—the fitted values of the free parameters; "loss"—their mean
+        squared log error; "model"—a solow model with the fitted parameters
+        (and E chosen so that, with L = 1, it matches the level of output), whose
+        path(t) reproduces the fit; "fit"—a dataframe of data and fitted
+        output by date; "starts"—a dataframe of the L-BFGS-B results
+    '''
+
+    if data is None:
+        from delong_functions.dataset_functions import load_dataset
+        data = load_dataset('quarterly_accounts', ['real_gdp'])['real_gdp']
+    data = data.dropna()
+    index = data.index
+    if isinstance(index, pd.PeriodIndex):
+        per_year = {'Q': 4, 'M': 12}.get(index.freqstr[0], 1)
+        t = (index.asi8 - index.asi8[0])/per_year
+    else:
+        t = np.asarray(index, dtype = float) - float(index[0])
+    log_data = np.log(data.to_numpy(dtype = float))
+
+    names = list(free)
+    model = model if model is not None else solow()
+    fixed = {name: model.initdata[name] for name in ('s', 'n', 'g', 'δ', 'α', 'κ')}
+    bounds = [(bounds or solow_calibration_bounds)[name] for name in names]
+    low, high = np.array(bounds).T
+
+    # one vectorized pass over a random population of candidates
+    rng = np.random.default_rng(seed)
+    candidates = low + (high - low)*rng.random((population, len(names)))
+    with np.errstate(all = 'ignore'):
+        loss, _ = _solow_calibration_loss(candidates, names, fixed, t, log_data)
+    best = candidates[np.argsort(np.where(np.isfinite(loss), loss, np.inf))[:starts]]
+
+    # refine the best of them
+    workers = workers or os.cpu_count() or 1
+    arguments = [names, fixed, t, log_data, bounds]
+    if workers == 1:
+        results = [_solow_calibration_start(θ0, *arguments) for θ0 in best]
+    else:
+        with ProcessPoolExecutor(max_workers = min(workers, len(best))) as pool:
+            results = list(pool.map(_solow_calibration_start, best,
+                *[[argument]*len(best) for argument in arguments]))
+    runs = pd.DataFrame([dict(zip(names, x), loss = fun, success = success) for x, fun, success in results])
+    runs = runs.sort_values('loss').reset_index(drop = True)
+
+    θ = runs.loc[0, names].to_numpy(dtype = float)
+    log_Y, _ = _solow_log_output(θ[None], names, fixed, t)
+    level = (log_data - log_Y[0]).mean()
+    params = dict(zip(names, θ))
+    values = {**fixed, **params}
+    α = values['α']
+    fitted = solow(n = values['n'], s = values['s'], δ = values['δ'], α = α, g = values['g'],
+                   κ = values['κ'], E = np.exp(level), L = 1.0)
+
+    return {'params': params,
+            'loss': runs.loc[0, 'loss'],
+            'model': fitted,
+            'fit': pd.DataFrame({'data': data.to_numpy(dtype = float), 'fitted': np.exp(log_Y[0] + level),
+                                 't': t}, index = index),
+            'starts': runs}
+
+
+
+def _malthusian_map(κ, y, s, δ, α, β, ϕ, ysub, h, γ):
+    """One application of malthusian.update, written in terms of the
+    capital-output ratio κ and output per worker y alone."""
+    n = β*(y/(ϕ*ysub)-1)
+    g = h-n/γ
+    # capital per efficiency unit of labor next period
+    k = (s + (1-δ)*κ)*κ**(α/(1-α))*np.exp(-(n+g))
+    return k**(1-α), y*κ**(-α/(1-α))*np.exp(g)*k**α
+
+
+def malthusian_steady_states(β=0.025, ϕ=1, ysub=1, h=0, γ=2.0, s=0.15, α=0.5, δ=0.05,
+                             L=None, E=1/3, K=3.0, tol=0.01, max_periods=100000):
+    """
+    Steady states and convergence speeds of the malthusian model for
+    arrays of parameters, which are broadcast against one another. The
+    fixed point of the discrete update rule is in closed form:
+
+        n* = γh,   y* = ϕ ysub (1 + γh/β),
+        κ* = s/(e^{n*} - 1 + δ),   E* = y* κ*^(-α/(1-α))
+
+    The half-life comes from the largest eigenvalue of the update rule,
+    linearized around (κ*, y*). If an initial labor force L is given,
+    the number of periods until both κ and y are within tol
+    (proportionally) of their steady-state values is found by iterating
+    the two-variable form of the update rule for all parameter sets at
+    once, dropping each as it converges (NaN if not within max_periods).
+
+    Returns a dataframe with one row per parameter set.
+    """
+    β, ϕ, ysub, h, γ, s, α, δ, E, K = [np.array(x, dtype = float).ravel() for x in
+        np.broadcast_arrays(β, ϕ, ysub, h, γ, s, α, δ, E, K)]
+    params = (s, δ, α, β, ϕ, ysub, h, γ)
+    n_star = γ*h
+    y_star = ϕ*ysub*(1+γ*h/β)
+    κ_star = s/(np.exp(n_star) - 1 + δ)
+
+    # Jacobian of the update rule at the steady state, by central differences
+    jacobian = np.empty((len(κ_star), 2, 2))
+    for j, point in enumerate((κ_star, y_star)):
+        step = 1e-6*point
+        up = [κ_star, y_star]; up[j] = point + step
+        down = [κ_star, y_star]; down[j] = point - step
+        for i, (plus, minus) in enumerate(zip(_malthusian_map(*up, *params), _malthusian_map(*down, *params))):
+            jacobian[:, i, j] = (plus - minus)/(2*step)
+    λ = np.abs(np.linalg.eigvals(jacobian)).max(axis = 1)
+
+    steady = pd.DataFrame({'β': β, 'ϕ': ϕ, 'ysub': ysub, 'h': h, 'γ': γ, 's': s, 'α': α, 'δ': δ,
+        'κ_star': κ_star, 'n_star': n_star, 'y_star': y_star,
+        'E_star': y_star*κ_star**(-α/(1-α)), 'half_life': np.log(0.5)/np.log(λ)})
+
+    if L is not None:
+        L = np.broadcast_to(np.asarray(L, dtype = float), K.shape)
+        Y = K**α*(E*L)**(1-α)
+        κ, y = K/Y, Y/L
+        periods = np.full(len(κ_star), np.nan)
+        active = np.arange(len(κ_star))
+        for t in range(max_periods + 1):
+            done = ((np.abs(κ/κ_star[active] - 1) <= tol) & (np.abs(y/y_star[active] - 1) <= tol))
+            periods[active[done]] = t
+            active, κ, y = active[~done], κ[~done], y[~done]
+            if len(active) == 0:
+                break
+            κ, y = _malthusian_map(κ, y, *[p[active] for p in params])
+        steady['periods_to_tol'] = periods
+    return steady
+
+
+class long_run_series:
+
+    """
+    A long-run series, such as population or income per capita, known only
+    at irregular dates: thousands of years apart in antiquity, every year
+    in modern times. Between dates the series is taken to grow at a
+    constant rate, so its log is interpolated linearly. The log values at
+    the known dates are a cumulative index of growth, from which the
+    average growth rate over any period follows with two binary searches.
+    Grids of values are cached, and simulations of the malthusian model
+    can be put side by side with the data:
+
+        population = long_run_series(df['Human Population (Millions)'])
+        population.grid(-10000, 2000, 100)
+        population.growth_rate(1500, 1800)
+        population.compare(malthusian(h = .0005), 1500, 1800)
+    """
+
+    def __init__(self, data, name = None, maxsize = 32):
+        data = pd.Series(data).dropna().sort_index()
+        if (data <= 0).any():
+            raise ValueError("a long-run series must be positive to be interpolated in logs")
+        self.name = name if name is not None else data.name
+        self.years = data.index.to_numpy(dtype = float)
+        self.values = data.to_numpy(dtype = float)
+        # cumulative log index: growth between two dates is a difference of it
+        self.log_index = np.log(self.values)
+        self.maxsize = maxsize
+        self.grids = OrderedDict()
+
+    def __len__(self):
+        return len(self.years)
+
+    def log_at(self, years):
+        "Log of the series at any dates within its range (NaN outside)."
+        years = np.asarray(years, dtype = float)
+        inside = (years >= self.years[0]) & (years <= self.years[-1])
+        return np.where(inside, np.interp(years, self.years, self.log_index), np.nan)[()]
+
+    def at(self, years):
+        "The series at any dates within its range, interpolated at constant growth."
+        return np.exp(self.log_at(years))
+
+    def growth_rate(self, start, end):
+        "Average continuously-compounded annual growth rate from start to end."
+        start, end = np.asarray(start, dtype = float), np.asarray(end, dtype = float)
+        return ((self.log_at(end) - self.log_at(start))/(end - start))[()]
+
+    def grid(self, start = None, end = None, step = 1):
+        """The series on the grid of dates start, start + step, ... up to end
+        (default its first and last dates), as a pandas series. Grids are
+        cached, least-recently-used first out."""
+        start = self.years[0] if start is None else start
+        end = self.years[-1] if end is None else end
+        key = (start, end, step)
+        if key in self.grids:
+            self.grids.move_to_end(key)
+        else:
+            years = np.arange(start, end + step/2, step)
+            values = self.at(years)
+            years.flags.writeable = values.flags.writeable = False
+            self.grids[key] = (years, values)
+            if len(self.grids) > self.maxsize:
+                self.grids.popitem(last = False)
+        years, values = self.grids[key]
+        return pd.Series(values, index = pd.Index(years, name = 'year'), name = self.name)
+
+    def growth_rates(self, start = None, end = None, step = 1):
+        "Average annual growth rate over each step of the grid, indexed by its end."
+        levels = self.grid(start, end, step)
+        return (np.log(levels).diff()/step).iloc[1:].rename(self.name)
+
+    def _combine(self, other, sign):
+        # log-linear series multiply and divide exactly on the union of their dates
+        years = np.union1d(self.years, other.years)
+        years = years[(years >= max(self.years[0], other.years[0])) & (years <= min(self.years[-1], other.years[-1]))]
+        return long_run_series(pd.Series(np.exp(self.log_at(years) + sign*other.log_at(years)), index = years))
+
+    def __mul__(self, other):
+        return self._combine(other, 1)
+
+    def __truediv__(self, other):
+        "Ratio of two series, e.g. income over population for income per capita."
+        return self._combine(other, -1)
+
+    def compare(self, model, start, end, var = 'L', normalize = True):
+        '''Simulate a malthusian model (one period a year) from start to end
+        and set the path of one of its variables beside the data.
+
+        Parameters
+        ==========
+
+        model : malthusian
+            the model to simulate, from its initial conditions
+        start, end : int
+            the first and last years
+        var : string (optional)
+            the model variable to compare; default 'L', population
+        normalize : boolean (optional)
+            if true, scale the model path to equal the data in year start,
+            since the model's units are arbitrary; default true
+
+        Returns
+        =======
+
+        comparison : pandas dataframe
+            indexed by year: "data", "model", and "log_gap", the log of
+            model over data
+        '''
+        data = self.grid(start, end, 1)
+        path = model.simulate(len(data))[var]
+        if normalize:
+            path = path * (data.iloc[0]/path[0])
+        comparison = pd.DataFrame({'data': data.to_numpy(), 'model': path}, index = data.index)
+        comparison['log_gap'] = np.log(comparison['model']/comparison['data'])
+        return comparison
+
+
+class simulation_cache:
+
+    """
+    Memoizes simulate() runs of solow and malthusian models. Runs are
+    keyed on the model class, its frozen initial data and the horizon,
+    kept in an in-memory LRU of at most maxsize runs and, if a directory
+    is given, also saved there as .npy files that later sessions
+    memory-map. A hit skips the simulation entirely (and so leaves the
+    model's own state untouched) and returns a trajectory over a
+    read-only array:
+
+        cache = simulation_cache(directory = 'sim_cache')
+        run = cache.simulate(delong_classes.malthusian(h=.0005), 5000)
+    """
+
+    def __init__(self, maxsize = 128, directory = None):
+        self.maxsize, self.directory = maxsize, directory
+        self.runs = OrderedDict()
+        self.hits, self.misses = 0, 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok = True)
+
+    @staticmethod
+    def key(model, T):
+        "The cache key for T periods of the given model."
+        frozen = tuple(sorted((para, float(value)) for para, value in model.initdata.items()))
+        return (type(model).__name__, frozen, T)
+
+    def _filename(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f'{key[0]}-{digest}-{key[2]}.npy')
+
+    def simulate(self, model, T):
+        "Return the trajectory of T periods of the model, simulating it only on a miss."
+        key = self.key(model, T)
+        if key in self.runs:
+            self.hits += 1
+            self.runs.move_to_end(key)
+            data, variables = self.runs[key]
+            return trajectory(data, variables)
+
+        variables = model.variables
+        filename = None if self.directory is None else self._filename(key)
+        if filename is not None and os.path.exists(filename):
+            self.hits += 1
+            data = np.load(filename, mmap_mode = 'r')
+        else:
+            self.misses += 1
+            run = model.simulate(T)
+            data = run.to_numpy() if isinstance(run, pd.DataFrame) else run.data
+            data.flags.writeable = False
+            if filename is not None:
+                # write under a temporary name so that readers never see a partial file
+                np.save(filename + '.tmp.npy', data)
+                os.replace(filename + '.tmp.npy', filename)
+
+        self.runs[key] = (data, list(variables))
+        if len(self.runs) > self.maxsize:
+            self.runs.popitem(last = False)
+        return trajectory(data, variables)
+
+    def clear(self):
+        "Empty the in-memory cache; files saved on disk are kept."
+        self.runs.clear()
 
 
 
@@ -201,7 +1332,8 @@ class gini:
     For a two-class distribution of income. Initialize 
     the class with a size-of-upper-class variable
     equal to 1/5 and a share-of-upper-class variable
-    equal to 4/5
+    equal to 4/5. For more groups, or for raw incomes,
+    see delong_functions.inequality_functions
     """
     
     def __init__(self,
@@ -210,7 +1342,8 @@ class gini:
                 ):
         self.upper_class = upper_class
         self.share = share
-        self.gini_value = self.share - self.upper_class
+        # the two-class table is a special case: gini_value = share - upper_class
+        self.gini_value = grouped_gini([1 - upper_class, upper_class], [1 - share, share])
         self.income_ratio = ((self.share/self.upper_class)/
             ((1-self.share)/(1-self.upper_class)))
 
@@ -250,31 +1383,32 @@ class 𝜅_convergence_graph:
                        T = 200):
         self.𝜅_0, self.s, self.n, self.g, self.𝛿, self.θ, self.T = 𝜅_0, s, n, g, 𝛿, θ, T 
 
-    def draw(self):
-        "Draw the convergence graph"
-        𝜅_0, s, n, g, 𝛿, θ, T = self.𝜅_0, self.s, self.n, self.g, self.𝛿, self.θ, self.T
-        𝜅_star = s/(n+g+𝛿)
-        𝜅_max = 2*𝜅_star
-        𝜅_min = 0.5
-
-        𝜅_star_series = [𝜅_star]
-        𝜅_series = [𝜅_0]
+    def paths(self):
+        """Calculate the convergence paths. 𝜅_0, s, n, g, 𝛿 and θ may each be a
+        scalar or an array; they are broadcast against one another, and the
+        result is a (trajectories x T+1) array with one row per combination,
+        computed in closed form:
 
-        for t in range(T):
-            𝜅_star_series = 𝜅_star_series + [𝜅_star]
-            𝜅_series = 𝜅_series + [𝜅_star + (𝜅_series[t-1] - 𝜅_star)*np.exp(-(n+g+𝛿)/(1+θ))]
+        𝜅_t = 𝜅* + (𝜅_0 - 𝜅*) exp(-t (n+g+𝛿)/(1+θ))
+        """
+        𝜅_0, s, n, g, 𝛿, θ = [np.array(x, dtype = float).ravel() for x in
+            np.broadcast_arrays(self.𝜅_0, self.s, self.n, self.g, self.𝛿, self.θ)]
+        𝜅_star = s/(n+g+𝛿)
+        t = np.arange(self.T + 1)
+        decay = np.exp(-np.outer((n+g+𝛿)/(1+θ), t))
+        return 𝜅_star[:, None] + (𝜅_0 - 𝜅_star)[:, None]*decay, 𝜅_star
 
+    def draw(self, ax = None):
+        "Draw the convergence graph, with one line for each trajectory"
+        𝜅_series, 𝜅_star = self.paths()
+        t = np.arange(self.T + 1)
 
-        𝜅_convergence_df = pd.DataFrame()
-        𝜅_convergence_df['steady_state_capital_intensity'] = 𝜅_star_series
-        𝜅_convergence_df['capital_intensity'] = 𝜅_series
+        if ax is None:
+            ax = plt.gca()
 
-        ax = plt.gca()
-        
-        𝜅_convergence_df.capital_intensity.plot(ax=ax)
-        𝜅_convergence_df.steady_state_capital_intensity.plot(ax=ax,
-                 title = 'Convergence of Capital-Intensity to Steady-State κ*')
-        
+        ax.plot(t, 𝜅_series.T)
+        ax.hlines(np.unique(𝜅_star), 0, self.T, colors = 'black', linestyles = 'dashed')
+        ax.set_title('Convergence of Capital-Intensity to Steady-State κ*')
         ax.set_xlabel("Date")
         ax.set_ylabel("Capital-Intensity")
-
+        return ax
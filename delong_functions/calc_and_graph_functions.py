@@ -4,6 +4,8 @@ import numpy as np
 import scipy.stats
 import pandas as pd
 
+from delong_functions.market_functions import market_equilibrium
+
 plt.style.use('seaborn-whitegrid')
 matplotlib.rc("font", family="Verdana")
 fig_size = plt.rcParams["figure.figsize"]
@@ -140,14 +142,17 @@ def print_market_summary(consumer_surplus, producer_surplus, equilibrium_price,
 
 
 def standard_supply_and_demand_graph(maximum_willingness_to_pay, demand_slope, 
-    minimum_opportunity_cost, supply_slope, market_for_title):
+    minimum_opportunity_cost, supply_slope, market_for_title, draw = True, 
+    print_summary = True):
     """
     Function to calculate a graph and summary market statistics from slope-intercept
     linear descriptions of supply and demand. Requires four floats for **maximum 
     willingness to pay** on the part of potential demanders, **minimum opportunity 
     cost** on the part of potential suppliers, demand and supply slopes, and a string
     identifying the market and commodity. Returns a matplotlib figure object, an ax
-    subplots object, and a dictionary of market equilibrium summary statistics
+    subplots object, and a dictionary of market equilibrium summary statistics.
+    The calculation is done by market_equilibrium(); the graph and the printed 
+    summary can each be switched off
     
     Parameters
     ==========
@@ -180,6 +185,12 @@ def standard_supply_and_demand_graph(maximum_willingness_to_pay, demand_slope,
         the market and commodity of the supply-and-demand equilibrium— for
         example: "Lattes at Euphoric State"; passed to standard_supply_and_demand_graph() 
         and then passed to print_market_summary()
+    
+    draw : boolean (optional)
+        if false, draw no graph, and return None for fig and ax; default true
+    
+    print_summary : boolean (optional)
+        if false, do not print the market summary; default true
         
     Returns
     =======
@@ -222,13 +233,25 @@ def standard_supply_and_demand_graph(maximum_willingness_to_pay, demand_slope,
             standard_supply_and_demand_graph()
     """
     
-    equilibrium_quantity = ((maximum_willingness_to_pay - minimum_opportunity_cost)/
-        (supply_slope + demand_slope))
-    equilibrium_price = (maximum_willingness_to_pay - equilibrium_quantity * demand_slope)
-    consumer_surplus = ((maximum_willingness_to_pay - equilibrium_price) * 
-        equilibrium_quantity/2)
-    producer_surplus = ((equilibrium_price - minimum_opportunity_cost) * 
-        equilibrium_quantity/2)
+    market = market_equilibrium(maximum_willingness_to_pay, demand_slope, 
+        minimum_opportunity_cost, supply_slope)
+    equilibrium_quantity = float(market["Equilibrium Quantity"])
+    equilibrium_price = float(market["Equilibrium Price"])
+    consumer_surplus = float(market["Consumer Surplus"])
+    producer_surplus = float(market["Producer Surplus"])
+    
+    equilibrium = {"Equilibrium Price": equilibrium_price,
+        "Equilibrium Quantity": equilibrium_quantity,
+        "Consumer Surplus": consumer_surplus,
+        "Producer Surplus": producer_surplus,
+        "Market": market_for_title}
+    
+    if print_summary:
+        print_market_summary(consumer_surplus, producer_surplus, equilibrium_price, 
+        equilibrium_quantity, market_for_title)
+    
+    if not draw:
+        return None, None, equilibrium
     
     fig, ax = plt.subplots()
     max_x_lim = 1.5 * equilibrium_quantity
@@ -249,15 +272,6 @@ def standard_supply_and_demand_graph(maximum_willingness_to_pay, demand_slope,
     draw_supply_line(minimum_opportunity_cost, supply_slope)
     plt.legend()
     fig.canvas.draw()
-    
-    equilibrium = {"Equilibrium Price": equilibrium_price,
-        "Equilibrium Quantity": equilibrium_quantity,
-        "Consumer Surplus": consumer_surplus,
-        "Producer Surplus": producer_surplus,
-        "Market": market_for_title}
-    
-    print_market_summary(consumer_surplus, producer_surplus, equilibrium_price, 
-    equilibrium_quantity, market_for_title)
 
     return fig, ax, equilibrium
 
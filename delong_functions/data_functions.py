@@ -1,8 +1,12 @@
-import pandas_datareader
 from pandas import DataFrame, Series
 import pandas as pd
 import os
-from urllib.request import urlretrieve
+import hashlib
+import json
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from urllib.request import urlretrieve, urlopen, Request
 
 def data_FREDseries(seriesName, sourceURL,
     sourceDescription = "You need to add a source description", 
@@ -43,11 +47,73 @@ def data_FREDseries(seriesName, sourceURL,
     
     return data_dict
 
+def data_FREDseries_bulk(series, max_workers = 8):
+    '''
+    Read in many FRED csv series at once. The downloads run concurrently
+    on a pool of threads sharing one pooled HTTP session (so connections
+    to the FRED server are reused), each series is parsed in the thread
+    that fetched it, and the results are aligned on their dates.
+    
+    Parameters:
+    ===========
+    
+    series : list of tuples
+        (seriesName, sourceURL) pairs, optionally extended to 
+        (seriesName, sourceURL, sourceDescription, sourceNotes) as for
+        data_FREDseries(); sourceURL may also be a local file path
+    max_workers (optional) : int
+        number of series fetched at the same time; default 8
+       
+    Returns:
+    ========
+    
+    data_dict : pandas dictionary
+        data_dict["df"] is one dataframe with a column for each series,
+        outer-joined on date; data_dict["series"] maps each seriesName
+        to a dictionary of its sourceURL, sourceDescription and sourceNotes
+    '''
+    
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+    from io import BytesIO
+    
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections = max_workers, 
+        pool_maxsize = max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    
+    def fetch_and_parse(entry):
+        seriesName, sourceURL = entry[0], entry[1]
+        if sourceURL.startswith(("http://", "https://")):
+            response = session.get(sourceURL)
+            response.raise_for_status()
+            source = BytesIO(response.content)
+        else:
+            source = sourceURL
+        data_df = pd.read_csv(source, parse_dates = True, index_col = 0)
+        return data_df.iloc[:, 0].rename(seriesName)
+    
+    with session, ThreadPoolExecutor(max_workers = max_workers) as pool:
+        columns = list(pool.map(fetch_and_parse, series))
+    
+    data_dict = {}
+    data_dict["df"] = pd.concat(columns, axis = 1, join = "outer").sort_index()
+    data_dict["series"] = {}
+    for entry in series:
+        seriesName, sourceURL = entry[0], entry[1]
+        data_dict["series"][seriesName] = {"sourceURL": sourceURL,
+            "sourceDescription": entry[2] if len(entry) > 2 else "You need to add a source description",
+            "sourceNotes": entry[3] if len(entry) > 3 else "You need to add source notes"}
+    
+    return data_dict
+
 def getdata_read_or_download(filename, source_URL, force_download = False):
     '''Use pandas to read in data from a specified local file in the current
     working directory, or download data from a specified source URL if the 
     local file does not exist in the current working directory. Download
     can be forced if the local file is corrupt or simply needs to be updated.
+    (getdata_cached() keeps one shared, content-addressed copy instead.)
     
     Parameters:
     ===========
@@ -66,6 +132,247 @@ def getdata_read_or_download(filename, source_URL, force_download = False):
 
     # Use: from delong_functions.data_functions import getdata_read_or_download # get or download data file
 
+def default_cache_directory():
+    '''Return the directory shared by every notebook for cached data: the 
+    DELONG_DATA_CACHE environment variable if set, else ~/.cache/delong_functions'''
+    
+    return os.environ.get("DELONG_DATA_CACHE", 
+        os.path.join(os.path.expanduser("~"), ".cache", "delong_functions"))
+
+def _write_atomically(path, write):
+    # write under a temporary name so that readers never see a partial file
+    temporary = path + ".tmp"
+    write(temporary)
+    os.replace(temporary, path)
+
+def _write_bytes(content):
+    def write(path):
+        with open(path, "wb") as output_file:
+            output_file.write(content)
+    return write
+
+def getdata_cached(source_URL, refresh = False, cache_dir = None, **read_csv_kwargs):
+    '''Read in a csv data file from a source URL through a local cache shared 
+    by every notebook, whatever directory it runs in. 
+    
+    The cache is keyed by the source URL and by the sha256 hash of the
+    downloaded content. The first download stores the raw csv file, parses
+    it once, and keeps a binary columnar copy of the parsed dataframe
+    (Parquet if pyarrow is installed, otherwise a pickle) together with
+    metadata: ETag, Last-Modified, content hash and column dtypes. Later
+    reads load the binary copy and never touch the csv file or the network.
+    
+    With refresh = True the source is asked whether the file has changed, 
+    sending the stored ETag and Last-Modified headers; a 304 Not Modified 
+    answer, or identical content, keeps the cached copy without re-parsing.
+    A binary copy that has gone missing is parsed again from the raw csv 
+    file, and a missing raw file is downloaded again. file:// URLs work too, which makes offline use and testing easy.
+    
+    Parameters:
+    ===========
+    source_URL : string                # location of data on internet (or file:// URL)
+    refresh : boolean (optional)       # if True, check the source for a newer version
+    cache_dir : string (optional)      # cache location; default default_cache_directory()
+    **read_csv_kwargs (optional)       # passed to pd.read_csv on first ingest
+        
+    Returns:
+    ========
+    dataframe : pandas dataframe       # the data file for the analysis'''
+    
+    cache_dir = cache_dir or default_cache_directory()
+    os.makedirs(os.path.join(cache_dir, "index"), exist_ok = True)
+    os.makedirs(os.path.join(cache_dir, "objects"), exist_ok = True)
+    url_key = hashlib.sha256(source_URL.encode("utf-8")).hexdigest()
+    metadata_path = os.path.join(cache_dir, "index", url_key + ".json")
+    
+    metadata = None
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as metadata_file:
+            metadata = json.load(metadata_file)
+    
+    # parse the raw csv file only the first time these read_csv arguments are used
+    parse_key = json.dumps(read_csv_kwargs, sort_keys = True, default = str)
+    
+    # the index may outlive the objects it points to (a cache pruned by hand, 
+    # say): re-parse if the binary copy is gone, and download again if the 
+    # raw csv file needed for that is gone too
+    if metadata is not None:
+        parsed = metadata["parsed"].get(parse_key)
+        if parsed is not None and not os.path.exists(os.path.join(cache_dir, "objects", parsed["binary"])):
+            del metadata["parsed"][parse_key]
+        raw_path = os.path.join(cache_dir, "objects", metadata["content_hash"] + ".csv")
+        if parse_key not in metadata["parsed"] and not os.path.exists(raw_path):
+            metadata = None
+    
+    changed = False
+    if metadata is None or refresh:
+        request = Request(source_URL)
+        if metadata is not None and metadata.get("etag"):
+            request.add_header("If-None-Match", metadata["etag"])
+        if metadata is not None and metadata.get("last_modified"):
+            request.add_header("If-Modified-Since", metadata["last_modified"])
+        try:
+            with urlopen(request) as response:
+                content = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except HTTPError as error:
+            if error.code != 304 or metadata is None:
+                raise
+            content = None
+        
+        if content is not None:
+            content_hash = hashlib.sha256(content).hexdigest()
+            if metadata is None or metadata["content_hash"] != content_hash:
+                raw_path = os.path.join(cache_dir, "objects", content_hash + ".csv")
+                if not os.path.exists(raw_path):
+                    _write_atomically(raw_path, _write_bytes(content))
+                metadata = {"source_URL": source_URL, 
+                    "content_hash": content_hash, 
+                    "parsed": {}}
+            metadata["etag"], metadata["last_modified"] = etag, last_modified
+            metadata["fetched"] = datetime.now(timezone.utc).isoformat()
+            changed = True
+    
+    if parse_key not in metadata["parsed"]:
+        metadata["parsed"][parse_key] = _ingest(cache_dir, metadata["content_hash"], 
+            parse_key, read_csv_kwargs)
+        changed = True
+    if changed:
+        _write_atomically(metadata_path, 
+            _write_bytes(json.dumps(metadata, indent = 1).encode("utf-8")))
+    
+    binary_path = os.path.join(cache_dir, "objects", metadata["parsed"][parse_key]["binary"])
+    if binary_path.endswith(".parquet"):
+        return pd.read_parquet(binary_path)
+    return pd.read_pickle(binary_path)
+
+def _ingest(cache_dir, content_hash, parse_key, read_csv_kwargs):
+    # parse the raw content once, and keep a binary columnar copy of the 
+    # parsed dataframe along with its column dtypes
+    dataframe = pd.read_csv(os.path.join(cache_dir, "objects", content_hash + ".csv"), 
+        **read_csv_kwargs)
+    
+    parsed_name = content_hash + "-" + hashlib.sha256(parse_key.encode("utf-8")).hexdigest()[:16]
+    try:
+        import pyarrow
+        binary = parsed_name + ".parquet"
+        _write_atomically(os.path.join(cache_dir, "objects", binary), 
+            lambda path: dataframe.to_parquet(path))
+    except ImportError:
+        binary = parsed_name + ".pkl"
+        _write_atomically(os.path.join(cache_dir, "objects", binary), 
+            lambda path: dataframe.to_pickle(path))
+    
+    return {"binary": binary,
+        "schema": {str(column): str(dtype) for column, dtype in dataframe.dtypes.items()}}
+
+def FRED_tail_URL(sourceURL, start):
+    '''Return a URL that asks FRED only for the observations from the date 
+    start onward, by setting the cosd (chart observation start date) query 
+    parameter of a fredgraph.csv download link; URLs from other sources are 
+    returned unchanged, and so are downloaded in full.'''
+    
+    parts = urlsplit(sourceURL)
+    if not parts.path.endswith("fredgraph.csv"):
+        return sourceURL
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "cosd"]
+    query.append(("cosd", pd.Timestamp(start).strftime("%Y-%m-%d")))
+    return urlunsplit(parts._replace(query = urlencode(query)))
+
+def data_FREDseries_incremental(seriesName, sourceURL, 
+    sourceDescription = "You need to add a source description", 
+    sourceNotes = "You need to add source notes",
+    revision_window = 12, cache_dir = None):
+    '''
+    Like data_FREDseries(), but keeps a local copy of the series and on each
+    call fetches only its recent tail: the last revision_window stored 
+    observations (which FRED may have revised) and anything newer. Those
+    rows replace the stored ones from that date on, and the result is saved
+    again along with a small json file recording its source and the date 
+    of its last observation, which is checked against the stored copy 
+    before it is used. The first call downloads the full history.
+    
+    Parameters:
+    ===========
+    
+    seriesName, sourceURL, sourceDescription, sourceNotes : 
+        as for data_FREDseries(); sourceURL should be a fredgraph.csv link
+        (other URLs work, but are downloaded in full every time)
+    revision_window (optional) : int
+        number of most recent stored observations to fetch again; 0 fetches
+        only observations after the last one stored. Default 12. If the
+        fetch returns nothing, the stored copy is kept as it is
+    cache_dir (optional) : string
+        where the local copies live; default default_cache_directory()
+       
+    Returns:
+    ========
+    
+    data_dict : pandas dictionary
+        as for data_FREDseries(), with data_dict["lastObservation"], the 
+        date of the latest observation, and data_dict["newRows"], the number
+        of observations fetched by this call
+    '''
+    
+    series_dir = os.path.join(cache_dir or default_cache_directory(), "series")
+    os.makedirs(series_dir, exist_ok = True)
+    stem = os.path.join(series_dir, hashlib.sha256(sourceURL.encode("utf-8")).hexdigest())
+    
+    # trust the stored copy only if its sidecar describes it: same source, 
+    # same last observation (a crash between the two writes below leaves 
+    # them out of step, and then the full history is fetched again)
+    stored = None
+    if os.path.exists(stem + ".pkl") and os.path.exists(stem + ".json"):
+        with open(stem + ".json") as metadata_file:
+            metadata = json.load(metadata_file)
+        stored = pd.read_pickle(stem + ".pkl")
+        if (metadata.get("sourceURL") != sourceURL or len(stored) == 0 or
+            metadata.get("lastObservation") != stored.index[-1].isoformat()):
+            stored = None
+    
+    if revision_window < 0:
+        raise ValueError(f"revision_window must be 0 or more, not {revision_window}")
+    
+    if stored is None or len(stored) <= revision_window:
+        data_df = pd.read_csv(sourceURL, parse_dates = True, index_col = 0)
+        new_rows = len(data_df)
+    else:
+        # with no revision window, ask only for what follows the last observation
+        if revision_window == 0:
+            start = stored.index[-1]
+            kept = stored
+        else:
+            start = stored.index[-revision_window]
+            kept = stored[stored.index < start]
+        tail_df = pd.read_csv(FRED_tail_URL(sourceURL, start), parse_dates = True, index_col = 0)
+        tail_df = tail_df[tail_df.index > start] if revision_window == 0 else tail_df[tail_df.index >= start]
+        new_rows = len(tail_df)
+        # an empty tail (a discontinued series, an empty reply) is no reason 
+        # to drop the stored observations it would have replaced
+        if new_rows == 0:
+            data_df = stored
+        else:
+            data_df = pd.concat([kept, tail_df.rename(columns = {tail_df.columns[0]: stored.columns[0]})])
+    data_df.rename(columns = {data_df.columns[0]: seriesName}, inplace = True)
+    
+    if stored is None or new_rows > 0:
+        metadata = {"sourceURL": sourceURL, 
+            "lastObservation": data_df.index[-1].isoformat(),
+            "updated": datetime.now(timezone.utc).isoformat()}
+        _write_atomically(stem + ".pkl", lambda path: data_df.to_pickle(path))
+        _write_atomically(stem + ".json", _write_bytes(json.dumps(metadata, indent = 1).encode("utf-8")))
+    
+    data_dict = {}
+    data_dict["sourceURL"] = sourceURL
+    data_dict["sourceDescription"] = sourceDescription
+    data_dict["sourceNotes"] = sourceNotes
+    data_dict["df"] = data_df
+    data_dict["lastObservation"] = data_df.index[-1]
+    data_dict["newRows"] = new_rows
+    
+    return data_dict
+
 # ----
 #
 # These are statistics functions for Brad DeLong's jupyter notebooks. Should exist 
@@ -0,0 +1,122 @@
+# ----
+#
+# These are loaders for the data files bundled in the data/ directory of
+# Brad DeLong's lecture-support github repository. Each file is described
+# once, in DATASETS: its column names (normalized to lower_case_with_
+# underscores, since the raw headers contain line breaks and doubled
+# spaces), the dtype of every column, and how to build its time index.
+# pandas then reads only the requested columns, with no type inference,
+# and each column is parsed only once per session (until the file changes).
+#
+# Use: from delong_functions.dataset_functions import load_dataset
+
+
+import os
+
+import pandas as pd
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+DATASETS = {
+    "unemployment": {
+        "file": "Unemployment.csv",
+        "columns": {                                   # in file order: name, dtype
+            "year": "int64",
+            "civilian_noninstitutional_population": "int64",
+            "civilian_labor_force": "int64",
+            "percent_in_labor_force": "float64",
+            "employed": "int64",
+            "percent_employed": "float64",
+            "agriculture_employees": "int64",
+            "nonagricultural_employees": "int64",
+            "unemployed": "int64",
+            "percent_unemployed": "float64",
+            "not_in_labor_force": "int64"},
+        "index": ["year"],
+        # annual period ordinals count years from 1970
+        "make_index": lambda key: pd.PeriodIndex.from_ordinals(
+            key["year"].to_numpy() - 1970, freq = "Y").rename("year"),
+        },
+    "detailed_unemployment": {
+        "file": "detailed_unemployment.csv",
+        "columns": {
+            "date": "str",
+            "total_unemployed": "float64",
+            "more_than_15_weeks": "int64",
+            "not_in_labor_searched_for_work": "int64",
+            "multi_jobs": "int64",
+            "leavers": "float64",
+            "losers": "float64",
+            "housing_price_index": "float64"},
+        "index": ["date"],
+        "make_index": lambda key: pd.DatetimeIndex(
+            pd.to_datetime(key["date"], format = "%m/%d/%y"), name = "date"),
+        },
+    "quarterly_accounts": {
+        "file": "Quarterly_Accounts.csv",
+        "columns": {
+            "year": "int64",
+            "quarter": "str",
+            "real_gdi": "float64",
+            "real_gdp": "float64",
+            "nominal_gdp": "float64"},
+        "index": ["year", "quarter"],
+        "make_index": lambda key: pd.PeriodIndex.from_fields(year = key["year"], 
+            quarter = key["quarter"].str[1].astype(int), freq = "Q").rename("quarter"),
+        },
+    }
+
+
+def load_dataset(name, columns = None, data_directory = DATA_DIRECTORY):
+    '''Load one of the data files bundled in data/, with declared dtypes,
+    normalized column names and a time index.
+
+    Parameters
+    ==========
+
+    name : string
+        a key of DATASETS: "unemployment" (annual, PeriodIndex),
+        "detailed_unemployment" (monthly, DatetimeIndex) or
+        "quarterly_accounts" (quarterly, PeriodIndex)
+    columns : list of strings (optional)
+        the normalized names of the columns wanted; only these are read,
+        and only if they have not been read before. Default all columns
+        other than those the index is built from
+    data_directory : string (optional)
+        where the data files live; default the repository's data/ directory
+
+    Returns
+    =======
+
+    dataframe : pandas dataframe
+        the requested columns, indexed by period or date
+    '''
+
+    dataset = DATASETS[name]
+    names = list(dataset["columns"])
+    if columns is None:
+        columns = [column for column in names if column not in dataset["index"]]
+    unknown = set(columns) - set(names)
+    if unknown:
+        raise KeyError(f"{name} has no columns {sorted(unknown)}; choose from {names}")
+
+    # parse each column at most once per version of the file; the time index
+    # is built from the key columns on the first load
+    path = os.path.join(data_directory, dataset["file"])
+    key = (name, os.path.abspath(path), os.path.getmtime(path))
+    store = _dataset_stores.get(key)
+    missing = [column for column in columns if store is None or column not in store]
+    if missing or store is None:
+        wanted = missing if store is not None else dataset["index"] + missing
+        parsed = pd.read_csv(path, header = 0, names = names, usecols = wanted,
+            dtype = {column: dataset["columns"][column] for column in wanted})
+        if store is None:
+            store = _dataset_stores[key] = {"index": dataset["make_index"](parsed)}
+        for column in missing:
+            store[column] = parsed[column].to_numpy()
+    return pd.DataFrame({column: store[column] for column in columns}, index = store["index"])
+
+
+# the columns of each bundled data file parsed so far, and its time index,
+# kept until the file changes
+_dataset_stores = {}
@@ -0,0 +1,497 @@
+# ----
+#
+# Inequality measures: the Gini coefficient, the Lorenz curve, top income
+# shares and the Theil index, computed from raw income vectors (optionally
+# weighted, as household survey microdata are) or from grouped tables of
+# population and income shares (quintiles, deciles, or the two-class
+# economy of delong_classes.gini).
+#
+# Everything works from the sorted income vector: the Lorenz curve is the
+# running sum of sorted incomes, and the Gini coefficient is one minus
+# twice the area under it. The running sums are taken a chunk at a time,
+# so beyond the sort no temporary is larger than `chunk` elements per row,
+# and peak memory, besides the inputs, is that of the sort: about 12 bytes
+# per income for unweighted incomes (a sorted copy, and numpy's sort
+# buffer), 24 with weights (the sort order, and sorted copies of incomes
+# and weights). gini_by_group() adds a one- or two-byte group code per
+# income: about 18 bytes per income, or 25 with weights. So 10^8 weighted
+# incomes in groups take about 2.5 GB on top of the 1.6 GB of the data.
+#
+# Each function accepts either one income vector or a 2-D array with one
+# row per country or year; gini_by_group() takes ragged groups instead.
+#
+# For data too large to load at all, income_sketch reads it in chunks into
+# a fixed-size, mergeable summary with bounded error.
+#
+# Use: from delong_functions.inequality_functions import gini, lorenz_curve
+
+
+import numpy as np
+import pandas as pd
+
+CHUNK = 2**20
+
+
+def _as_rows(incomes, weights, axis):
+    "Move the income axis last and flatten the rest into rows."
+    x = np.moveaxis(np.asarray(incomes, dtype = float), axis, -1)
+    batch_shape = x.shape[:-1]
+    x = x.reshape(-1, x.shape[-1])
+    w = None
+    if weights is not None:
+        w = np.moveaxis(np.broadcast_to(np.asarray(weights, dtype = float),
+            np.asarray(incomes).shape), axis, -1).reshape(x.shape)
+    return x, w, batch_shape
+
+
+def _sort_rows(x, w, overwrite_input):
+    "Sort each row by income, carrying the weights along."
+    if w is None:
+        if overwrite_input:
+            x.sort(axis = -1)
+            return x, None
+        return np.sort(x, axis = -1), None
+    order = np.argsort(x, axis = -1)
+    return np.take_along_axis(x, order, -1), np.take_along_axis(w, order, -1)
+
+
+def _lorenz_sums(x, w, chunk):
+    """For rows of sorted incomes x (weights w, or None for equal weights)
+    return the total weight W, total income S, and Σ w_i (S_{i-1} + S_i),
+    where S_i is the running sum of weighted income: twice the area under
+    the Lorenz curve, times W S."""
+
+    rows, n = x.shape
+    carry = np.zeros(rows)
+    area = np.zeros(rows)
+    total_weight = np.zeros(rows) + (n if w is None else 0)
+    for start in range(0, n, chunk):
+        xc = x[:, start:start + chunk]
+        if w is None:
+            income = xc
+        else:
+            wc = w[:, start:start + chunk]
+            income = xc * wc
+            total_weight += wc.sum(axis = -1)
+        running = np.cumsum(income, axis = -1)
+        running += carry[:, None]
+        # S_{i-1} + S_i = 2 S_i - w_i x_i
+        if w is None:
+            area += 2*running.sum(axis = -1) - income.sum(axis = -1)
+        else:
+            area += 2*np.einsum('ij,ij->i', wc, running) - np.einsum('ij,ij->i', wc, income)
+        carry = running[:, -1].copy()
+    return total_weight, carry, area
+
+
+def gini(incomes, weights = None, axis = -1, chunk = CHUNK, overwrite_input = False):
+    '''Gini coefficient of an income distribution, from the area under
+    its Lorenz curve.
+
+    Parameters
+    ==========
+
+    incomes : array
+        incomes (non-negative), one vector or one row per country or year
+    weights : array (optional)
+        population weights, broadcastable to incomes; default equal weights
+    axis : int (optional)
+        the axis along which incomes run; default the last
+    chunk : int (optional)
+        number of incomes per row summed at a time; default 2**20
+    overwrite_input : boolean (optional)
+        if true and unweighted, sort incomes in place rather than sorting
+        a copy; default false. Otherwise the sort holds about 12 bytes per
+        income, or 24 with weights (the sort order, and sorted copies of
+        incomes and weights)
+
+    Returns
+    =======
+
+    gini : float or array
+        one coefficient per row, shaped like incomes without the income axis
+    '''
+
+    x, w, batch_shape = _as_rows(incomes, weights, axis)
+    x, w = _sort_rows(x, w, overwrite_input and isinstance(incomes, np.ndarray)
+        and incomes.dtype == float)
+    total_weight, total_income, area = _lorenz_sums(x, w, chunk)
+    value = 1 - area/(total_weight*total_income)
+    return value.reshape(batch_shape)[()]
+
+
+def lorenz_curve(incomes, weights = None, points = None):
+    '''Points on the Lorenz curve of one income distribution.
+
+    Parameters
+    ==========
+
+    incomes : one-dimensional array
+        incomes (non-negative)
+    weights : one-dimensional array (optional)
+        population weights; default equal weights
+    points : int or array (optional)
+        if an int, the number of evenly spaced population shares at which to
+        evaluate the curve; if an array, those population shares. Default
+        every observation, which for large samples is a great many points
+
+    Returns
+    =======
+
+    population_share, income_share : arrays
+        cumulative shares of population and of income, from (0, 0) to (1, 1)
+    '''
+
+    x, w, _ = _as_rows(incomes, weights, -1)
+    x, w = _sort_rows(x, w, False)
+    x, w = x[0], (None if w is None else w[0])
+    income = x if w is None else x*w
+    income_share = np.concatenate(([0.0], np.cumsum(income)))
+    income_share /= income_share[-1]
+    if w is None:
+        population_share = np.arange(len(x) + 1)/len(x)
+    else:
+        population_share = np.concatenate(([0.0], np.cumsum(w)))
+        population_share /= population_share[-1]
+    if points is None:
+        return population_share, income_share
+    if np.ndim(points) == 0:
+        points = np.linspace(0, 1, int(points))
+    points = np.asarray(points, dtype = float)
+    return points, np.interp(points, population_share, income_share)
+
+
+def top_share(incomes, top = 0.1, weights = None):
+    '''Share of total income received by the richest fraction `top` of the
+    population, interpolating within the observation that straddles the
+    cutoff.
+
+    Parameters
+    ==========
+
+    incomes : one-dimensional array
+        incomes (non-negative)
+    top : float or array (optional)
+        fraction(s) of the population at the top; default 0.1
+    weights : one-dimensional array (optional)
+        population weights; default equal weights
+
+    Returns
+    =======
+
+    share : float or array
+        shaped like top
+    '''
+
+    top = np.asarray(top, dtype = float)
+    x = np.asarray(incomes, dtype = float)
+    if weights is None:
+        # only the top of the distribution needs ordering: partition, don't sort
+        n = len(x)
+        # at least one observation, so that top < 1/n interpolates toward 0
+        k = min(n, max(1, int(np.ceil(top.max()*n))))
+        richest = -np.sort(-np.partition(x, n - k)[n - k:])
+        income = np.concatenate(([0.0], np.cumsum(richest)))
+        population = np.arange(k + 1)/n
+        return np.interp(top, population, income)[()]/x.sum()
+    population_share, income_share = lorenz_curve(x, weights)
+    return 1 - np.interp(1 - top, population_share, income_share)[()]
+
+
+def theil(incomes, weights = None, axis = -1):
+    '''Theil T index, Σ w (x/μ) log(x/μ) / Σ w, with 0 log 0 = 0.
+
+    Parameters
+    ==========
+
+    incomes : array
+        incomes (non-negative), one vector or one row per country or year
+    weights : array (optional)
+        population weights, broadcastable to incomes; default equal weights
+    axis : int (optional)
+        the axis along which incomes run; default the last
+
+    Returns
+    =======
+
+    theil : float or array
+        one index per row
+    '''
+
+    x = np.asarray(incomes, dtype = float)
+    w = np.ones_like(x) if weights is None else np.broadcast_to(np.asarray(weights, dtype = float), x.shape)
+    mean = (w*x).sum(axis = axis, keepdims = True)/w.sum(axis = axis, keepdims = True)
+    ratio = x/mean
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        terms = np.where(ratio > 0, ratio*np.log(ratio), 0.0)
+    return ((w*terms).sum(axis = axis)/w.sum(axis = axis))[()]
+
+
+def grouped_gini(population_shares, income_shares, axis = -1):
+    '''Gini coefficient from a grouped table: the population share and
+    income share of each group (quintiles, deciles, classes). Incomes are
+    taken to be equal within each group, so this is the lower bound on the
+    Gini coefficient consistent with the table. Groups need not be ordered.
+
+    For two classes, the upper one a fraction u of the population receiving
+    a share s of income, this is s - u.
+
+    Parameters
+    ==========
+
+    population_shares : array
+        share of population in each group; one table or one row per country
+        or year
+    income_shares : array
+        share of income received by each group, shaped like population_shares
+    axis : int (optional)
+        the axis along which groups run; default the last
+
+    Returns
+    =======
+
+    gini : float or array
+        one coefficient per table
+    '''
+
+    p = np.moveaxis(np.asarray(population_shares, dtype = float), axis, -1)
+    s = np.moveaxis(np.asarray(income_shares, dtype = float), axis, -1)
+    p, s = np.broadcast_arrays(p, s)
+    # order the groups from poorest to richest by mean income
+    order = np.argsort(s/p, axis = -1)
+    p = np.take_along_axis(p, order, -1)
+    s = np.take_along_axis(s, order, -1)
+    p = p/p.sum(axis = -1, keepdims = True)
+    cumulative = np.cumsum(s, axis = -1)/s.sum(axis = -1, keepdims = True)
+    previous = cumulative - s/s.sum(axis = -1, keepdims = True)
+    return (1 - (p*(previous + cumulative)).sum(axis = -1))[()]
+
+
+def gini_by_group(incomes, groups, weights = None, chunk = CHUNK):
+    '''Gini coefficients for many countries or years at once, from one long
+    income vector and a parallel vector of group labels; groups may be of
+    any sizes.
+
+    Parameters
+    ==========
+
+    incomes : one-dimensional array
+        incomes (non-negative)
+    groups : one-dimensional array
+        the country, year, or other label of each income
+    weights : one-dimensional array (optional)
+        population weights; default equal weights
+    chunk : int (optional)
+        number of incomes summed at a time; default 2**20. Beyond that,
+        memory is held by the sort: the group codes, one sort order and
+        sorted copies of incomes (and weights), about 18 bytes per income
+        (25 with weights) for numeric labels; labels that are Python
+        objects or numpy strings take more while they are coded
+
+    Returns
+    =======
+
+    gini : pandas series
+        indexed by group label
+    '''
+
+    x = np.asarray(incomes, dtype = float)
+    # label codes by hashing rather than sorting (except for fixed-width 
+    # strings, which pandas would first turn into objects), narrowed to the 
+    # smallest integer type
+    g = np.asarray(groups)
+    if g.dtype.kind in 'SU':
+        labels, codes = np.unique(g, return_inverse = True)
+    else:
+        codes, labels = pd.factorize(g, sort = True, use_na_sentinel = False)
+    del g
+    codes = codes.astype(np.min_scalar_type(len(labels)))
+    # one sort order, applied to each vector in turn, so that beyond it only
+    # one sorted copy is made at a time
+    order = np.lexsort((x, codes))
+    codes, x = codes[order], x[order]
+    w = None if weights is None else np.asarray(weights, dtype = float)[order]
+    del order
+
+    # running sums restart at the beginning of each group, and are taken a
+    # chunk at a time, carrying the running sum of a group that spans chunks
+    area = np.zeros(len(labels))
+    total_weight = np.zeros(len(labels))
+    total_income = np.zeros(len(labels))
+    carry = 0.0
+    for start in range(0, len(x), chunk):
+        cc = codes[start:start + chunk]
+        income = x[start:start + chunk]
+        wc = np.ones_like(income) if w is None else w[start:start + chunk]
+        if w is not None:
+            income = income*wc
+        if start > 0 and codes[start - 1] != cc[0]:
+            carry = 0.0
+        starts = np.flatnonzero(np.r_[True, cc[1:] != cc[:-1]])
+        ends = np.r_[starts[1:], len(cc)]
+        running = np.cumsum(income)
+        running += carry
+        offsets = np.r_[0.0, running[starts[1:] - 1]]
+        running -= np.repeat(offsets, ends - starts)
+        group = cc[starts]
+        area[group] += np.add.reduceat(wc*(2*running - income), starts)
+        total_weight[group] += np.add.reduceat(wc, starts)
+        total_income[group] = running[ends - 1]
+        carry = running[-1]
+    return pd.Series(1 - area/(total_weight*total_income), index = labels, name = "gini")
+
+
+class income_sketch:
+    """
+    A streaming, mergeable summary of an income distribution too large to
+    hold in memory. Incomes are counted into logarithmically spaced bins,
+    each (1 + relative_error) times as wide as the last, recording for each
+    bin its total weight and its total income. So:
+
+    - the count, total and mean of income are exact;
+    - gini() treats incomes as equal within each bin, and so understates
+      the Gini coefficient, by less than relative_error/4;
+    - quantile() is off by at most a factor (1 + relative_error);
+    - top_share() is off by at most the income share of one bin.
+
+    Incomes of zero or less go in a bin of their own, below all the others.
+    Sketches with the same relative_error built from separate chunks (say
+    by parallel workers) combine with merge(), and the result is the same
+    as sketching all the data at once.
+
+    Use: sketch = income_sketch.from_csv("incomes.csv", "income", weights = "weight")
+         sketch.gini(), sketch.top_share(0.01)
+    """
+
+    def __init__(self, relative_error = 1e-3):
+        self.relative_error = relative_error
+        self._log_width = np.log1p(relative_error)
+        self._offset = 0                      # bin number of _count[0]
+        self._count = np.zeros(0)
+        self._sum = np.zeros(0)
+        self._low_count = 0.0                 # incomes <= 0
+        self._low_sum = 0.0
+
+    def _grow(self, lowest, highest):
+        "Extend the bin arrays to cover bins lowest to highest."
+        if len(self._count):
+            lowest, highest = min(lowest, self._offset), max(highest, self._offset + len(self._count) - 1)
+        count, total = np.zeros(highest - lowest + 1), np.zeros(highest - lowest + 1)
+        start = self._offset - lowest
+        count[start:start + len(self._count)] = self._count
+        total[start:start + len(self._sum)] = self._sum
+        self._offset, self._count, self._sum = lowest, count, total
+
+    def update(self, incomes, weights = None):
+        "Add a chunk of incomes (and population weights) to the sketch; NaNs are skipped."
+        x = np.asarray(incomes, dtype = float).ravel()
+        w = np.ones_like(x) if weights is None else np.asarray(weights, dtype = float).ravel()
+        keep = ~(np.isnan(x) | np.isnan(w))
+        x, w = x[keep], w[keep]
+
+        low = x <= 0
+        if low.any():
+            self._low_count += w[low].sum()
+            self._low_sum += (w[low]*x[low]).sum()
+            x, w = x[~low], w[~low]
+        if not len(x):
+            return self
+
+        bins = np.floor(np.log(x)/self._log_width).astype(np.int64)
+        lowest, highest = bins.min(), bins.max()
+        if not len(self._count) or lowest < self._offset or highest >= self._offset + len(self._count):
+            self._grow(lowest, highest)
+        bins -= self._offset
+        self._count += np.bincount(bins, weights = w, minlength = len(self._count))
+        self._sum += np.bincount(bins, weights = w*x, minlength = len(self._sum))
+        return self
+
+    def merge(self, other):
+        "Add another sketch, with the same relative_error, into this one."
+        if other.relative_error != self.relative_error:
+            raise ValueError("can only merge sketches with the same relative_error")
+        if len(other._count):
+            self._grow(other._offset, other._offset + len(other._count) - 1)
+            start = other._offset - self._offset
+            self._count[start:start + len(other._count)] += other._count
+            self._sum[start:start + len(other._sum)] += other._sum
+        self._low_count += other._low_count
+        self._low_sum += other._low_sum
+        return self
+
+    @classmethod
+    def from_chunks(cls, chunks, relative_error = 1e-3):
+        "Sketch an iterable of income arrays, or of (incomes, weights) pairs."
+        sketch = cls(relative_error)
+        for chunk in chunks:
+            if isinstance(chunk, tuple):
+                sketch.update(*chunk)
+            else:
+                sketch.update(chunk)
+        return sketch
+
+    @classmethod
+    def from_array(cls, incomes, weights = None, chunk = CHUNK, relative_error = 1e-3):
+        "Sketch an array, such as an np.memmap or np.load(..., mmap_mode = 'r'), a chunk at a time."
+        sketch = cls(relative_error)
+        for start in range(0, len(incomes), chunk):
+            sketch.update(incomes[start:start + chunk],
+                None if weights is None else weights[start:start + chunk])
+        return sketch
+
+    @classmethod
+    def from_csv(cls, path, column, weights = None, chunksize = 10**6, relative_error = 1e-3,
+                 **read_csv_kwargs):
+        "Sketch one column of a CSV file (weighted by another), reading chunksize rows at a time."
+        usecols = [column] if weights is None else [column, weights]
+        sketch = cls(relative_error)
+        for chunk in pd.read_csv(path, usecols = usecols, chunksize = chunksize, **read_csv_kwargs):
+            sketch.update(chunk[column].to_numpy(), None if weights is None else chunk[weights].to_numpy())
+        return sketch
+
+    def _groups(self):
+        "Weight and income of each nonempty bin, poorest first."
+        count = np.r_[self._low_count, self._count]
+        total = np.r_[self._low_sum, self._sum]
+        nonempty = count > 0
+        return count[nonempty], total[nonempty]
+
+    @property
+    def count(self):
+        return self._low_count + self._count.sum()
+
+    @property
+    def total(self):
+        return self._low_sum + self._sum.sum()
+
+    @property
+    def mean(self):
+        return self.total/self.count
+
+    def gini(self):
+        "Gini coefficient, understated by less than relative_error/4."
+        count, total = self._groups()
+        return grouped_gini(count, total)
+
+    def lorenz_curve(self):
+        "Cumulative population and income shares at the bin boundaries."
+        count, total = self._groups()
+        return (np.r_[0.0, np.cumsum(count)]/count.sum(),
+                np.r_[0.0, np.cumsum(total)]/total.sum())
+
+    def top_share(self, top = 0.1):
+        "Share of income received by the richest fraction `top` of the population."
+        population_share, income_share = self.lorenz_curve()
+        return 1 - np.interp(1 - np.asarray(top, dtype = float), population_share, income_share)[()]
+
+    def quantile(self, q):
+        "Income at population quantile q, to within a factor (1 + relative_error)."
+        q = np.asarray(q, dtype = float)
+        cumulative = np.cumsum(self._count) + self._low_count
+        position = q*self.count
+        bins = np.minimum(np.searchsorted(cumulative, position), len(cumulative) - 1)
+        # interpolate geometrically across the bin
+        before = cumulative[bins] - self._count[bins]
+        fraction = np.clip((position - before)/np.maximum(self._count[bins], 1e-300), 0, 1)
+        value = np.exp((self._offset + bins + fraction)*self._log_width)
+        return np.where(position <= self._low_count, 0.0, value)[()]
@@ -1,45 +1,87 @@
-# set up the environment by reading in libraries: 
+# set up the environment by reading in libraries:
 # os... graphics... data manipulation... time... math... statistics...
+#
+# The heavy libraries are not imported here but on first use: the names
+# below (plt, pd, sm, and so on) are looked up through __getattr__ and
+# bound the first time they are accessed. So
+#
+#     import delong_functions.initialization as init
+#     init.pd.read_csv(...)
+#
+# loads pandas and nothing else. "from delong_functions.initialization
+# import *" still binds every name, and so still imports everything.
 
 import sys
 import os
+import importlib
 from urllib.request import urlretrieve
 
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import PIL as pil
-from IPython.display import Image
-
-import pandas as pd
-from pandas import DataFrame, Series
-import pandas_datareader
 from datetime import datetime
 
-import scipy as sp
-import numpy as np
 import math
 import random
 
-import seaborn as sns
-import statsmodels
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
+# name: (module, attribute within the module, or None for the module itself)
+
+_lazy_imports = {
+    'mpl': ('matplotlib', None),
+    'plt': ('matplotlib.pyplot', None),
+    'pil': ('PIL', None),
+    'Image': ('IPython.display', 'Image'),
+    'pd': ('pandas', None),
+    'DataFrame': ('pandas', 'DataFrame'),
+    'Series': ('pandas', 'Series'),
+    'pandas_datareader': ('pandas_datareader', None),
+    'sp': ('scipy', None),
+    'np': ('numpy', None),
+    'sns': ('seaborn', None),
+    'statsmodels': ('statsmodels', None),
+    'sm': ('statsmodels.api', None),
+    'smf': ('statsmodels.formula.api', None),
+
+    # import delong functions
+
+    'getdata_read_or_download': ('delong_functions.data_functions', 'getdata_read_or_download'),  # get or download data file
+    'initialize_basic_figure': ('delong_functions.stat_functions', 'initialize_basic_figure'),     # initialize graphics
+    'data_FREDseries': ('delong_functions.data_functions', 'data_FREDseries'),                    # construct a useful dict with source
+                                                                                                  # and notes info from a previously
+                                                                                                  # downloaded FRED csv file
+}
+
+__all__ = ['sys', 'os', 'urlretrieve', 'datetime', 'math', 'random', 'figure_size'] + list(_lazy_imports)
+
+
+def _setup_graphics(plt):
+    "graphics setup: seaborn-darkgrid and figure size..."
+    plt.style.use('seaborn-darkgrid')
+
+    figure_size = plt.rcParams["figure.figsize"]
+    figure_size[0] = 7
+    figure_size[1] = 7
+    plt.rcParams["figure.figsize"] = figure_size
+    return figure_size
+
 
-# graphics setup: seaborn-darkgrid and figure size...
+def __getattr__(name):
+    "Import a library the first time its name is used, and bind it in this module."
+    if name == 'figure_size':
+        __getattr__('plt')
+        return globals()['figure_size']
+    if name not in _lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-plt.style.use('seaborn-darkgrid')
+    module_name, attribute = _lazy_imports[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    if name == 'plt':
+        globals()['figure_size'] = _setup_graphics(value)
+    return value
 
-figure_size = plt.rcParams["figure.figsize"]
-figure_size[0] = 7
-figure_size[1] = 7
-plt.rcParams["figure.figsize"] = figure_size
 
-# import delong functions
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-from delong_functions.data_functions import getdata_read_or_download # get or download data file
-from delong_functions.stat_functions import initialize_basic_figure  # initialize graphics
-from delong_functions.data_functions import data_FREDseries          # construct a useful dict with source
-                                                                     # and notes info from a previously 
-                                                                     # downloaded FRED csv file
-# check to see if functions successfully created... 
-# NOW COMMENTED OUT: getdata_read_or_download? initialize_basic_figure?
\ No newline at end of file
+# check to see if functions successfully created...
+# NOW COMMENTED OUT: getdata_read_or_download? initialize_basic_figure?
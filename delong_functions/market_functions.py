@@ -0,0 +1,106 @@
+# ----
+#
+# Market calculations for Brad DeLong's jupyter notebooks, with no graphics:
+# importing this module does not import matplotlib or change its settings, so
+# it is safe for batch computation and for worker processes. The graphing
+# functions in calc_and_graph_functions are built on top of it.
+#
+# Use: from delong_functions.market_functions import market_equilibrium
+
+
+import numpy as np
+
+
+def market_equilibrium(maximum_willingness_to_pay, demand_slope, 
+    minimum_opportunity_cost, supply_slope, tax = 0, price_ceiling = None, 
+    price_floor = None):
+    """
+    Calculate market equilibrium and surplus statistics for linear supply and 
+    demand, for one market or for many at once: every parameter may be a float 
+    or an array, and they are broadcast against one another. No graph is drawn 
+    and nothing is printed, so this is the function to use for large numbers 
+    of parameterizations; standard_supply_and_demand_graph() draws one of them.
+    
+    A per-unit tax drives a wedge between the price buyers pay and the price 
+    sellers receive. A binding price ceiling or floor applies to the price 
+    buyers pay; under a ceiling the quantity is what sellers will supply, under
+    a floor what buyers will demand, and in either case the units go to the 
+    buyers with the highest willingness to pay and come from the sellers with
+    the lowest opportunity cost.
+    
+    Parameters
+    ==========
+    
+    maximum_willingness_to_pay : float or array
+        the y-axis (price axis) intercept of the demand curve
+    demand_slope : float or array
+        the slope of the demand curve
+    minimum_opportunity_cost : float or array
+        the y-axis (price axis) intercept of the supply curve
+    supply_slope : float or array
+        the slope of the supply curve
+    tax : float or array (optional)
+        per-unit tax; default 0
+    price_ceiling : float or array (optional)
+        the highest legal price; default none (use np.inf for no ceiling 
+        in some markets of an array)
+    price_floor : float or array (optional)
+        the lowest legal price; default none (use 0 or -np.inf for no 
+        floor in some markets of an array)
+        
+    Returns
+    =======
+    
+    equilibrium : dict
+        floats, or arrays shaped like the broadcast parameters, keyed by:
+        
+            "Equilibrium Price"—the price buyers pay
+            "Seller Price"—the price sellers receive: "Equilibrium Price" 
+            less the tax
+            "Equilibrium Quantity"—the quantity produced and sold
+            "Consumer Surplus", "Producer Surplus"—as in 
+            standard_supply_and_demand_graph()
+            "Tax Revenue"—tax times quantity
+            "Deadweight Loss"—the total surplus lost relative to the 
+            undistorted market
+            "Excess Demand"—quantity demanded less quantity supplied at the 
+            prevailing prices: positive under a binding ceiling, negative 
+            under a binding floor, otherwise zero
+    """
+    
+    a, b, c, d, t = np.broadcast_arrays(*(np.asarray(parameter, dtype = float) for parameter in 
+        (maximum_willingness_to_pay, demand_slope, minimum_opportunity_cost, supply_slope, tax)))
+    
+    # the undistorted market, and the market with the tax wedge
+    efficient_quantity = np.maximum((a - c)/(b + d), 0)
+    quantity = np.maximum((a - c - t)/(b + d), 0)
+    price = a - b * quantity
+    
+    if price_ceiling is not None:
+        binding = price > price_ceiling
+        price = np.where(binding, price_ceiling, price)
+        supplied = np.maximum((price - t - c)/d, 0)
+        quantity = np.where(binding, np.minimum(quantity, supplied), quantity)
+    if price_floor is not None:
+        binding = price < price_floor
+        price = np.where(binding, price_floor, price)
+        demanded = np.maximum((a - price)/b, 0)
+        quantity = np.where(binding, np.minimum(quantity, demanded), quantity)
+    seller_price = price - t
+    
+    consumer_surplus = (a - price) * quantity - b * quantity**2/2
+    producer_surplus = (seller_price - c) * quantity - d * quantity**2/2
+    tax_revenue = t * quantity
+    deadweight_loss = (((a - c) * efficient_quantity - (b + d) * efficient_quantity**2/2) - 
+        (consumer_surplus + producer_surplus + tax_revenue))
+    excess_demand = np.maximum((a - price)/b, 0) - np.maximum((seller_price - c)/d, 0)
+    excess_demand = np.where(np.isclose(excess_demand, 0, atol = 1e-12), 0, excess_demand)
+    
+    return {"Equilibrium Price": price[()],
+        "Seller Price": seller_price[()],
+        "Equilibrium Quantity": quantity[()],
+        "Consumer Surplus": consumer_surplus[()],
+        "Producer Surplus": producer_surplus[()],
+        "Tax Revenue": tax_revenue[()],
+        "Deadweight Loss": deadweight_loss[()],
+        "Excess Demand": excess_demand[()]}
@@ -0,0 +1,221 @@
+# ----
+#
+# Headless batch rendering of the lecture graphs to image files.
+#
+# standard_supply_and_demand_graph(), initialize_basic_figure() and
+# 𝜅_convergence_graph.draw() build a new pyplot figure on every call. That
+# is what a notebook wants, but not a script writing hundreds of PNGs: each
+# figure stays registered with pyplot until closed, and most of the time
+# goes into creating axes, ticks and text that are the same every time.
+#
+# Here pyplot is never imported. Each frame class owns one Agg-backed
+# matplotlib Figure and its artists, and render() only swaps in new data
+# (Line2D.set_data, Text.set_text, axis limits) before saving. Styles are
+# applied with a context manager, so global rcParams are left alone.
+# render_batch() hands out chunks of jobs to a process pool; each worker
+# builds one frame and reuses it for its whole chunk.
+#
+# Use: from delong_functions.render_functions import market_frame, render_batch
+#      render_batch(market_frame, [{"path": "latte.png", "market_for_title": "Lattes",
+#          "maximum_willingness_to_pay": 10, "demand_slope": 1,
+#          "minimum_opportunity_cost": 2, "supply_slope": 1}])
+
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import matplotlib.style
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from delong_functions.market_functions import market_equilibrium
+
+
+class frame:
+    """
+    One reusable figure with a single set of axes, drawn on the Agg canvas.
+    Subclasses create their artists once in __init__ and update them in
+    render(path, ...), which saves the figure to path and returns path.
+    """
+
+    def __init__(self, figsize = (6, 6), dpi = 100, style = None):
+        self.style = style
+        self.dpi = dpi
+        with self._styled():
+            self.figure = Figure(figsize = figsize, dpi = dpi)
+            FigureCanvasAgg(self.figure)
+            self.ax = self.figure.add_subplot()
+        self.lines = []
+
+    def _styled(self):
+        "Apply the frame's matplotlib style (a name or an rc dict) for the duration."
+        return matplotlib.style.context(self.style) if self.style is not None else nullcontext()
+
+    def _set_lines(self, x, ys, **line_kwargs):
+        "Show one line per row of ys, reusing (and if need be adding) Line2D artists."
+        ys = np.atleast_2d(ys)
+        with self._styled():
+            while len(self.lines) < len(ys):
+                self.lines.append(self.ax.plot([], [], **line_kwargs)[0])
+        for line, y in zip(self.lines, ys):
+            line.set_data(x, y)
+            line.set_visible(True)
+        for line in self.lines[len(ys):]:
+            line.set_visible(False)
+
+    def save(self, path):
+        with self._styled():
+            self.figure.savefig(path, dpi = self.dpi)
+        return path
+
+
+class market_frame(frame):
+    """
+    The graph of standard_supply_and_demand_graph(): linear demand and supply,
+    and the market equilibrium, marked and annotated.
+    """
+
+    def __init__(self, figsize = (6, 6), dpi = 100, style = None):
+        super().__init__(figsize, dpi, style)
+        with self._styled():
+            self.title = self.figure.suptitle("", size = "20")
+            self.demand, = self.ax.plot([], [], color = "blue", label = "Demand")
+            self.supply, = self.ax.plot([], [], color = "green", label = "Supply")
+            self.point, = self.ax.plot([], [], marker = 'o', markersize = 8, color = "red")
+            self.annotation = self.ax.text(0, 0, "", size = "8")
+            self.ax.legend()
+
+    def render(self, path, maximum_willingness_to_pay, demand_slope,
+               minimum_opportunity_cost, supply_slope, market_for_title):
+        equilibrium = market_equilibrium(maximum_willingness_to_pay, demand_slope,
+            minimum_opportunity_cost, supply_slope)
+        quantity = float(equilibrium["Equilibrium Quantity"])
+        price = float(equilibrium["Equilibrium Price"])
+
+        x_vals = np.array([0, 1.5 * quantity])
+        self.ax.set_xlim(*x_vals)
+        self.ax.set_ylim(0, 1.2 * maximum_willingness_to_pay)
+        self.demand.set_data(x_vals, maximum_willingness_to_pay - demand_slope * x_vals)
+        self.supply.set_data(x_vals, minimum_opportunity_cost + supply_slope * x_vals)
+        self.point.set_data([quantity], [price])
+        self.annotation.set_position((quantity, 1.1 * price))
+        self.annotation.set_text("Market Equilibrium: \n" + "Quantity = " +
+            str(round(quantity, 2)) + "\nPrice = " + str(round(price, 2)))
+        self.title.set_text("Supply and Demand Graph: \n" + market_for_title)
+        self.ax.set_xlabel("Number of " + market_for_title, size = "10")
+        self.ax.set_ylabel("Price/Value of " + market_for_title, size = "10")
+        return self.save(path)
+
+
+class series_frame(frame):
+    """
+    The graph of initialize_basic_figure(): one series against x, with a
+    title and axis labels.
+    """
+
+    def __init__(self, figsize = (11, 7), dpi = 100, style = None, title_size = 25):
+        super().__init__(figsize, dpi, style)
+        with self._styled():
+            self.title = self.ax.set_title("", size = title_size)
+
+    def render(self, path, x, y, xtitle, ytitle, figure_title, series_color = "black",
+               tick_range = 4, zero_range_flag = False):
+        x, y = np.asarray(x), np.asarray(y)
+        self._set_lines(x, y)
+        self.lines[0].set_color(series_color)
+        self.ax.set_xlim(x.min(), x.max())
+        low, high = np.nanmin(y), np.nanmax(y)
+        margin = 0.05 * (high - low)
+        self.ax.set_ylim(0 if zero_range_flag else low - margin, high + margin)
+        self.ax.set_xticks(np.arange(min(x), max(x) + 1, tick_range))
+        self.ax.set_xlabel(xtitle)
+        self.ax.set_ylabel(ytitle)
+        self.title.set_text(figure_title)
+        return self.save(path)
+
+
+class convergence_frame(frame):
+    """
+    The graph of 𝜅_convergence_graph.draw(): one line per trajectory of the
+    capital-intensity κ, and dashed lines at the steady states κ*. Pass it
+    the output of 𝜅_convergence_graph.paths().
+    """
+
+    def __init__(self, figsize = (6, 6), dpi = 100, style = None):
+        super().__init__(figsize, dpi, style)
+        with self._styled():
+            self.steady_states = []
+            self.ax.set_title('Convergence of Capital-Intensity to Steady-State κ*')
+            self.ax.set_xlabel("Date")
+            self.ax.set_ylabel("Capital-Intensity")
+
+    def render(self, path, 𝜅_series, 𝜅_star):
+        𝜅_series = np.atleast_2d(𝜅_series)
+        t = np.arange(𝜅_series.shape[1])
+        self._set_lines(t, 𝜅_series)
+
+        levels = np.unique(𝜅_star)
+        with self._styled():
+            while len(self.steady_states) < len(levels):
+                self.steady_states.append(self.ax.plot([], [], color = 'black', linestyle = 'dashed')[0])
+        for line, level in zip(self.steady_states, levels):
+            line.set_data([0, t[-1]], [level, level])
+            line.set_visible(True)
+        for line in self.steady_states[len(levels):]:
+            line.set_visible(False)
+
+        self.ax.set_xlim(0, t[-1])
+        low = min(np.nanmin(𝜅_series), levels.min())
+        high = max(np.nanmax(𝜅_series), levels.max())
+        margin = 0.05 * (high - low)
+        self.ax.set_ylim(low - margin, high + margin)
+        return self.save(path)
+
+
+def _render_chunk(frame_class, frame_kwargs, jobs):
+    "Build one frame and render a list of jobs with it."
+    renderer = frame_class(**frame_kwargs)
+    return [renderer.render(**job) for job in jobs]
+
+
+def render_batch(frame_class, jobs, workers = None, chunk = None, **frame_kwargs):
+    '''Render many figures of one kind to files.
+
+    Parameters
+    ==========
+
+    frame_class : class
+        market_frame, series_frame, convergence_frame, or another subclass
+        of frame
+    jobs : list of dicts
+        keyword arguments for frame_class.render(), each including "path"
+    workers : int (optional)
+        number of worker processes; 1 renders in this process. Default
+        os.cpu_count()
+    chunk : int (optional)
+        number of jobs handed to a worker at a time; default enough for
+        about four chunks per worker
+    **frame_kwargs :
+        passed to frame_class(): figsize, dpi, style
+
+    Returns
+    =======
+
+    paths : list of strings
+        the files written, in the order of jobs
+    '''
+
+    jobs = list(jobs)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return _render_chunk(frame_class, frame_kwargs, jobs)
+
+    chunk = chunk or max(1, math.ceil(len(jobs)/(4 * workers)))
+    chunks = [jobs[start:start + chunk] for start in range(0, len(jobs), chunk)]
+    with ProcessPoolExecutor(max_workers = min(workers, len(chunks))) as executor:
+        results = executor.map(_render_chunk, [frame_class] * len(chunks),
+            [frame_kwargs] * len(chunks), chunks)
+        return [path for paths in results for path in paths]
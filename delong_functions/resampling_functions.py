@@ -0,0 +1,244 @@
+# ----
+#
+# Bootstrap and permutation inference for least-squares regressions, as
+# a complement to the asymptotic standard errors statsmodels reports.
+#
+# Rather than refitting a regression once per replication, replications are
+# drawn a block at a time as a matrix of resampled row indices (or of
+# residual sign flips) and all the regressions of a block are solved
+# together as batched least squares. Memory is then bounded by the block,
+# not by the number of replications: only the k coefficients of each
+# replication are kept. Blocks run in worker processes; each block draws
+# from its own child of one numpy SeedSequence, so a given seed gives the
+# same answer however many workers there are.
+#
+# Use: from delong_functions.resampling_functions import bootstrap_ols, permutation_test
+
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+
+def _design(y, X, add_constant):
+    "Complete cases of y and X as arrays, with names for the coefficients."
+    if not isinstance(X, pd.DataFrame):
+        X = np.asarray(X, dtype = float)
+        X = pd.DataFrame(X.reshape(len(X), -1), index = getattr(y, "index", None))
+        X.columns = [f"x{i + 1}" for i in range(X.shape[1])]
+    if add_constant:
+        X = X.copy()
+        X.insert(0, "const", 1.0)
+    if not isinstance(y, pd.Series):
+        y = pd.Series(np.asarray(y, dtype = float), index = X.index)
+    data = pd.concat([X, y.rename("__y__")], axis = 1).dropna()
+    return data["__y__"].to_numpy(dtype = float), data.drop(columns = "__y__").to_numpy(dtype = float), list(X.columns)
+
+
+def _batched_ols(X, y):
+    "Coefficients of the regressions of y[b] on X[b] for each b."
+    XX = np.einsum('bni,bnj->bij', X, X)
+    Xy = np.einsum('bni,bn->bi', X, y)
+    return np.linalg.solve(XX, Xy[..., None])[..., 0]
+
+
+def _singular(X):
+    "Which of the regressor matrices X[b] are rank-deficient."
+    XX = np.einsum('bni,bnj->bij', X, X)
+    return np.linalg.matrix_rank(XX, hermitian = True) < X.shape[-1]
+
+
+def _resampled_ols(X, y, draw, size, attempts = 100):
+    """Coefficients for size resamples of the rows of X and y, with row
+    indices from draw(count). A resample in which the regressors are
+    collinear (a dummy that happens to be all zeros, say) has no fit, and
+    is drawn again."""
+    index = draw(size)
+    redraw = _singular(X[index])
+    for attempt in range(attempts):
+        if not redraw.any():
+            return _batched_ols(X[index], y[index])
+        index[redraw] = draw(redraw.sum())
+        redraw[redraw] = _singular(X[index[redraw]])
+    raise ValueError(f"the regressors are collinear in nearly every resample: {redraw.sum()} of "
+        f"{size} were still singular after {attempts} redraws")
+
+
+def _block_indices(rng, size, n, block_length):
+    "Row indices for moving-block bootstrap samples: overlapping blocks of consecutive rows."
+    blocks = math.ceil(n/block_length)
+    starts = rng.integers(0, n - block_length + 1, size = (size, blocks))
+    return (starts[:, :, None] + np.arange(block_length)).reshape(size, -1)[:, :n]
+
+
+def _bootstrap_block(X, y, params, residuals, XX_inverse_X, method, block_length, size, seed):
+    "Coefficients for `size` bootstrap replications, drawn from the SeedSequence seed."
+    rng = np.random.default_rng(seed)
+    n = len(y)
+    if method == "pairs":
+        return _resampled_ols(X, y, lambda count: rng.integers(0, n, size = (count, n)), size)
+    if method == "block":
+        return _resampled_ols(X, y, lambda count: _block_indices(rng, count, n, block_length), size)
+    # with X held fixed, each replication is params + (X'X)^-1 X' e*
+    if method == "residual":
+        shocks = residuals[rng.integers(0, n, size = (size, n))]
+    elif method == "wild":
+        shocks = residuals * rng.choice(np.array([-1.0, 1.0]), size = (size, n))
+    else:
+        raise ValueError(f"unknown bootstrap method {method!r}: use 'pairs', 'residual', 'wild' or 'block'")
+    return params + shocks @ XX_inverse_X.T
+
+
+def _run_blocks(function, fixed, replications, block, seed, workers):
+    "Run function(*fixed, size, seed) over blocks of replications, in a pool unless workers is 1."
+    sizes = [min(block, replications - start) for start in range(0, replications, block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) == 1:
+        return np.concatenate([function(*fixed, size, child) for size, child in zip(sizes, seeds)])
+    with ProcessPoolExecutor(max_workers = min(workers, len(sizes))) as pool:
+        arguments = [[argument] * len(sizes) for argument in fixed]
+        return np.concatenate(list(pool.map(function, *arguments, sizes, seeds)))
+
+
+def bootstrap_ols(y, X, replications = 2000, method = "pairs", block_length = None,
+    add_constant = True, confidence = 0.95, interval = "percentile", seed = None,
+    workers = None, block = 256, return_replicates = False):
+    '''Bootstrap standard errors and confidence intervals for the coefficients
+    of a least-squares regression of y on X.
+
+    Parameters
+    ==========
+
+    y : one-dimensional array or pandas series
+        dependent variable
+    X : array or pandas dataframe
+        regressors, one row per observation
+    replications : int (optional)
+        number of bootstrap samples; default 2000
+    method : string (optional)
+        "pairs" resamples observations; "residual" resamples residuals,
+        holding X fixed; "wild" flips the signs of the residuals at random
+        (Rademacher weights), which allows for heteroskedasticity; "block"
+        resamples runs of block_length consecutive observations (the moving-
+        block bootstrap, for time series). Default "pairs". For "pairs" and
+        "block", a resample in which the regressors are collinear (as a
+        rare dummy can be) is drawn again
+    block_length : int (optional)
+        length of the blocks for method "block"; default n^(1/3), rounded up
+    add_constant : boolean (optional)
+        if true, include an intercept; default true
+    confidence : float (optional)
+        coverage of the intervals; default 0.95
+    interval : string (optional)
+        "percentile", or "bca" for bias-corrected and accelerated intervals
+        (acceleration from the jackknife); default "percentile"
+    seed : int (optional)
+        seed for the SeedSequence from which every block draws; default none
+    workers : int (optional)
+        number of processes; default os.cpu_count(), and 1 runs in this process
+    block : int (optional)
+        number of replications solved together; default 256
+    return_replicates : boolean (optional)
+        if true, also return the (replications x k) array of bootstrap
+        coefficients; default false
+
+    Returns
+    =======
+
+    table : pandas dataframe
+        one row per coefficient: "estimate", "std_error" (the standard
+        deviation of the bootstrap coefficients), "lower" and "upper"
+    '''
+
+    y, X, names = _design(y, X, add_constant)
+    n, k = X.shape
+    XX_inverse = np.linalg.inv(X.T @ X)
+    params = XX_inverse @ (X.T @ y)
+    residuals = y - X @ params
+    block_length = block_length or math.ceil(n**(1/3))
+
+    replicates = _run_blocks(_bootstrap_block, (X, y, params, residuals, XX_inverse @ X.T,
+        method, block_length), replications, block, seed, workers)
+
+    α = (1 - confidence)/2
+    if interval == "percentile":
+        levels = np.array([[α], [1 - α]]).repeat(k, axis = 1)
+    elif interval == "bca":
+        # bias correction from the share of replicates below the estimate,
+        # acceleration from the jackknife (leave-one-out coefficients by the
+        # Sherman-Morrison formula)
+        z0 = ndtri((replicates < params).mean(axis = 0))
+        leverage = np.einsum('ni,ij,nj->n', X, XX_inverse, X)
+        jackknife = params - (X @ XX_inverse) * (residuals/(1 - leverage))[:, None]
+        deviation = jackknife.mean(axis = 0) - jackknife
+        acceleration = (deviation**3).sum(axis = 0)/(6*((deviation**2).sum(axis = 0))**1.5)
+        z = ndtri(np.array([[α], [1 - α]]))
+        levels = ndtr(z0 + (z0 + z)/(1 - acceleration*(z0 + z)))
+    else:
+        raise ValueError(f"unknown interval {interval!r}: use 'percentile' or 'bca'")
+    bounds = np.array([[np.quantile(replicates[:, j], levels[i, j]) for j in range(k)] for i in range(2)])
+
+    table = pd.DataFrame({"estimate": params, "std_error": replicates.std(axis = 0, ddof = 1),
+        "lower": bounds[0], "upper": bounds[1]}, index = names)
+    if return_replicates:
+        return table, replicates
+    return table
+
+
+def _permutation_block(X, y, column, size, seed):
+    "t statistics of the coefficient on X[:, column] with that column randomly permuted."
+    rng = np.random.default_rng(seed)
+    n, k = X.shape
+    permuted = np.broadcast_to(X, (size, n, k)).copy()
+    permuted[:, :, column] = X[rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis = 1), column]
+    XX_inverse = np.linalg.inv(np.einsum('bni,bnj->bij', permuted, permuted))
+    params = np.einsum('bij,bnj,n->bi', XX_inverse, permuted, y)
+    residuals = y - np.einsum('bni,bi->bn', permuted, params)
+    σ2 = (residuals**2).sum(axis = 1)/(n - k)
+    return params[:, column]/np.sqrt(σ2*XX_inverse[:, column, column])
+
+
+def permutation_test(y, X, column, replications = 9999, add_constant = True, seed = None,
+    workers = None, block = 256):
+    '''Permutation test of the hypothesis that the coefficient on one regressor
+    is zero: the regressor is shuffled across observations, breaking its link
+    to y while keeping the others, and the regression is refit each time.
+
+    Parameters
+    ==========
+
+    y : one-dimensional array or pandas series
+        dependent variable
+    X : array or pandas dataframe
+        regressors, one row per observation
+    column : string or int
+        the regressor tested: a column name of X, or its position
+    replications : int (optional)
+        number of permutations; default 9999
+    add_constant, seed, workers, block : (optional)
+        as for bootstrap_ols()
+
+    Returns
+    =======
+
+    result : dict
+        "coefficient" and "t" (its t statistic) in the data, and "p_value",
+        the two-sided share of permutations with |t| at least as large
+        (counting the data itself among them)
+    '''
+
+    y, X, names = _design(y, X, add_constant)
+    position = names.index(column) if column in names else int(column) + add_constant
+    XX_inverse = np.linalg.inv(X.T @ X)
+    params = XX_inverse @ (X.T @ y)
+    residuals = y - X @ params
+    t = params[position]/np.sqrt(residuals @ residuals/(len(y) - X.shape[1])*XX_inverse[position, position])
+
+    statistics = _run_blocks(_permutation_block, (X, y, position), replications, block, seed, workers)
+    p_value = (1 + (np.abs(statistics) >= abs(t)).sum())/(replications + 1)
+    return {"coefficient": params[position], "t": t, "p_value": p_value}
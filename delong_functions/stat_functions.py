@@ -1,5 +1,12 @@
 import matplotlib as mpl
 import matplotlib.pyplot as plt
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 
 def initialize_basic_figure(x, y, xtitle, ytitle, figure_title, title_size = 25, series_color = "black", 
 	tick_range = 4, zero_range_flag = False):
@@ -48,6 +55,290 @@ def initialize_basic_figure(x, y, xtitle, ytitle, figure_title, title_size = 25,
 
 
 
+def rolling_ols(y, X, window = None, add_constant = True, min_nobs = None):
+    '''Least-squares regressions of y on X over every rolling window of the 
+    sample, or, with no window, over every expanding sample from the start: 
+    one fit ending at each observation. All fits come from running sums of 
+    the sufficient statistics X'X, X'y and y'y, so each new observation 
+    updates them at a cost that does not depend on the window length, and 
+    the coefficients of all windows are solved in one batched pass. Rows with 
+    missing values are left out of the windows that contain them.
+    
+    Parameters
+    ==========
+    
+    y : one-dimensional array or pandas series
+        dependent variable
+    X : one- or two-dimensional array or pandas dataframe
+        regressors, one row per observation
+    window : int (optional)
+        number of observations in each window; default none, for expanding 
+        windows
+    add_constant : boolean (optional)
+        if true, include an intercept, as sm.add_constant would; default true
+    min_nobs : int (optional)
+        fewest non-missing observations for a fit; default one more than 
+        the number of coefficients
+        
+    Returns
+    =======
+    
+    results : dict
+        "params" and "bse"—coefficients and their (nonrobust) standard errors, 
+        one row per window end; "rsquared" and "nobs". Rows before the first 
+        full window, for windows without enough observations, and for windows 
+        in which the regressors are collinear, are NaN. If X is a dataframe 
+        (or y a series) these are pandas objects on its index, with the 
+        intercept named "const"
+    '''
+    
+    index = getattr(X, "index", getattr(y, "index", None))
+    names = list(X.columns) if hasattr(X, "columns") else None
+    y = np.asarray(y, dtype = float)
+    X = np.asarray(X, dtype = float)
+    if X.ndim == 1:
+        X = X[:, None]
+    T, regressors = X.shape
+    k = regressors + add_constant
+    min_nobs = min_nobs or k + 1
+    
+    # zero out rows with missing data, and center on the full-sample means 
+    # (undone below) so the sums of squares don't lose precision
+    present = ~(np.isnan(y) | np.isnan(X).any(axis = 1))
+    y = np.where(present, y, 0.0)
+    X = np.where(present[:, None], X, 0.0)
+    if add_constant:
+        y_mean, X_mean = y[present].mean(), X[present].mean(axis = 0)
+        y = np.where(present, y - y_mean, 0.0)
+        X = np.where(present[:, None], X - X_mean, 0.0)
+        X = np.column_stack([present.astype(float), X])
+    
+    # running sums of the sufficient statistics; window sums are differences
+    def windowed(values):
+        running = np.cumsum(values, axis = 0)
+        if window is None:
+            return running
+        lagged = np.zeros_like(running)
+        lagged[window:] = running[:-window]
+        return running - lagged
+    
+    nobs = windowed(present.astype(float))
+    XX = windowed(X[:, :, None] * X[:, None, :])
+    Xy = windowed(X * y[:, None])
+    yy = windowed(y**2)
+    ysum = windowed(y)
+    
+    # solve every window at once
+    enough = nobs >= min_nobs
+    if window is not None:
+        enough[:window - 1] = False
+    # windows whose regressors are collinear (a break dummy that is constant 
+    # within the window, say) have no unique fit, and are left NaN
+    enough[enough] = np.linalg.matrix_rank(XX[enough]) == k
+    XX_inverse = np.full((T, k, k), np.nan)
+    XX_inverse[enough] = np.linalg.inv(XX[enough])
+    params = np.einsum('tij,tj->ti', XX_inverse, Xy)
+    ssr = yy - np.einsum('ti,ti->t', params, Xy)
+    tss = yy - ysum**2/nobs if add_constant else yy
+    σ2 = ssr/(nobs - k)
+    bse = np.sqrt(σ2[:, None] * np.diagonal(XX_inverse, axis1 = 1, axis2 = 2))
+    rsquared = 1 - ssr/tss
+    
+    if add_constant:
+        # intercept in the uncentered data
+        params[:, 0] += y_mean - params[:, 1:] @ X_mean
+        XX_inverse_const = (XX_inverse[:, 0, 0] - 2 * XX_inverse[:, 0, 1:] @ X_mean + 
+            np.einsum('tij,i,j->t', XX_inverse[:, 1:, 1:], X_mean, X_mean))
+        bse[:, 0] = np.sqrt(σ2 * XX_inverse_const)
+    
+    if names is not None or index is not None:
+        columns = (["const"] if add_constant else []) + (names or 
+            [f"x{i + 1}" for i in range(regressors)])
+        return {"params": pd.DataFrame(params, index = index, columns = columns),
+            "bse": pd.DataFrame(bse, index = index, columns = columns),
+            "rsquared": pd.Series(rsquared, index = index, name = "rsquared"),
+            "nobs": pd.Series(nobs, index = index, name = "nobs")}
+    return {"params": params, "bse": bse, "rsquared": rsquared, "nobs": nobs}
+
+
+
+def _inverse_or_nan(A):
+    "Inverses of a stack of symmetric matrices, NaN for those that are singular (or already NaN)."
+    inverse = np.full(A.shape, np.nan)
+    full_rank = np.isfinite(A).all(axis = (-2, -1))
+    full_rank[full_rank] = np.linalg.matrix_rank(A[full_rank], hermitian = True) == A.shape[-1]
+    inverse[full_rank] = np.linalg.inv(A[full_rank])
+    return inverse
+
+
+def _subset_fits(G, nobs, target, head, combos, tail, instruments, debiased):
+    """Fit every regressor set head + combos[i] + tail from the cross-product 
+    matrix G of all the data: by OLS, or, if there are instruments, by 2SLS 
+    with the exogenous regressors head + combos[i] and the instruments as 
+    the instrument set. Returns coefficients, standard errors and the sum 
+    of squared residuals for each row of combos, all NaN for sets that are
+    collinear (or, for 2SLS, whose instruments are)."""
+    
+    m = len(combos)
+    R = np.hstack([np.broadcast_to(head, (m, len(head))), combos, 
+        np.broadcast_to(tail, (m, len(tail)))]).astype(int)
+    k = R.shape[1]
+    XX = G[R[:, :, None], R[:, None, :]]
+    Xy = G[R, target]
+    yy = G[target, target]
+    
+    if instruments is None:
+        XX_inverse = _inverse_or_nan(XX)
+        params = np.einsum('mij,mj->mi', XX_inverse, Xy)
+        ssr = yy - np.einsum('mi,mi->m', params, Xy)
+        σ2 = ssr/(nobs - k)
+    else:
+        # X'PzX = X'Z (Z'Z)^-1 Z'X, with Z the exogenous regressors and instruments
+        Z = np.hstack([R[:, :k - len(tail)], np.broadcast_to(instruments, (m, len(instruments)))])
+        ZX = G[Z[:, :, None], R[:, None, :]]
+        W = _inverse_or_nan(G[Z[:, :, None], Z[:, None, :]]) @ np.concatenate([ZX, G[Z, target][:, :, None]], axis = 2)
+        XPX = np.einsum('mzi,mzj->mij', ZX, W[:, :, :k])
+        XPy = np.einsum('mzi,mz->mi', ZX, W[:, :, k])
+        XX_inverse = _inverse_or_nan(XPX)
+        params = np.einsum('mij,mj->mi', XX_inverse, XPy)
+        # residuals use X itself, not its projection
+        ssr = yy - 2*np.einsum('mi,mi->m', params, Xy) + np.einsum('mi,mij,mj->m', params, XX, params)
+        σ2 = ssr/(nobs - k) if debiased else ssr/nobs
+    bse = np.sqrt(σ2[:, None] * np.diagonal(XX_inverse, axis1 = 1, axis2 = 2))
+    return R, params, bse, ssr
+
+
+def specification_search(y, X, always = (), endogenous = None, instruments = None, 
+    min_size = 0, max_size = None, add_constant = True, sort_by = "bic", 
+    debiased = False, workers = None, chunk = 4096):
+    '''Fit a regression of y for every subset of the candidate regressors in 
+    X, and rank the results. The cross-product matrix of all the data is 
+    formed once; each specification is then solved from its own rows and 
+    columns of it, with all the specifications of one size solved together 
+    as a batch, so the data are never touched again. 
+    
+    With endogenous regressors and instruments, each specification is fit 
+    by two-stage least squares, as linearmodels.iv.IV2SLS(y, exog, endog, 
+    instruments).fit(cov_type = "unadjusted") would: the candidate 
+    regressors are exogenous, and serve as their own instruments.
+    
+    Parameters
+    ==========
+    
+    y : pandas series
+        dependent variable
+    X : pandas dataframe
+        candidate (exogenous) regressors
+    always : list of strings (optional)
+        columns of X to include in every specification; default none
+    endogenous : pandas dataframe (optional)
+        endogenous regressors, included in every specification
+    instruments : pandas dataframe (optional)
+        excluded instruments for the endogenous regressors
+    min_size, max_size : int (optional)
+        fewest and most candidate regressors (beyond always) in a 
+        specification; default every size
+    add_constant : boolean (optional)
+        if true, include an intercept in every specification; default true
+    sort_by : string (optional)
+        the column to rank by: "bic", "aic" (ascending), "rsquared" or 
+        "rsquared_adj" (descending); default "bic"
+    debiased : boolean (optional)
+        for 2SLS, estimate the error variance with a degrees-of-freedom 
+        correction; default false, as in linearmodels. OLS always uses it,
+        as in statsmodels
+    workers : int (optional)
+        number of processes; default os.cpu_count(), and 1 runs in this 
+        process
+    chunk : int (optional)
+        number of specifications solved together in one batch; default 4096
+        
+    Returns
+    =======
+    
+    specifications : pandas dataframe
+        one row per specification, ranked: "regressors", the included 
+        candidates joined with " + "; "size"; "nobs"; "rsquared", 
+        "rsquared_adj", "aic", "bic" and "ssr"; then, for every regressor, 
+        its coefficient under its own name and its standard error under its 
+        name + "_se" (NaN where excluded). Specifications whose regressors 
+        are collinear have no unique fit: their statistics are NaN, and they 
+        rank last
+    '''
+    
+    if (endogenous is None) != (instruments is None):
+        raise ValueError("give both endogenous regressors and instruments, for 2SLS, or neither, for OLS")
+    
+    # complete cases over every variable that appears in any specification
+    blocks = [X] + [block for block in (endogenous, instruments) if block is not None]
+    data = pd.concat(blocks + [y.rename("__y__")], axis = 1).dropna()
+    nobs = len(data)
+    names = (["const"] if add_constant else []) + list(X.columns) + (
+        list(endogenous.columns) if endogenous is not None else [])
+    D = data.to_numpy(dtype = float)
+    if add_constant:
+        D = np.column_stack([np.ones(nobs), D])
+    G = D.T @ D
+    
+    # positions in D: [const] X... endogenous... instruments... y
+    position = {name: i for i, name in enumerate(names)}
+    target = D.shape[1] - 1
+    head = np.array(([0] if add_constant else []) + [position[name] for name in always], dtype = int)
+    candidates = [position[name] for name in X.columns if name not in always]
+    tail = np.array([position[name] for name in endogenous.columns] if endogenous is not None else [], dtype = int)
+    iv = None
+    if endogenous is not None:
+        start = 1 + X.shape[1] + endogenous.shape[1] if add_constant else X.shape[1] + endogenous.shape[1]
+        iv = np.arange(start, start + instruments.shape[1])
+    
+    max_size = len(candidates) if max_size is None else max_size
+    tasks = []
+    for size in range(min_size, max_size + 1):
+        combos = np.array(list(itertools.combinations(candidates, size)), dtype = int).reshape(math.comb(len(candidates), size), size)
+        for start in range(0, len(combos), chunk):
+            tasks.append(combos[start:start + chunk])
+    arguments = [(G, nobs, target, head, combos, tail, iv, debiased) for combos in tasks]
+    
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = [_subset_fits(*task) for task in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers = min(workers, len(tasks))) as pool:
+            results = list(pool.map(_subset_fits, *zip(*arguments)))
+    
+    R = np.concatenate([np.pad(r[0], ((0, 0), (0, len(names) - r[0].shape[1])), constant_values = -1) 
+        for r in results])
+    k = (R >= 0).sum(axis = 1)
+    rows, columns = np.repeat(np.arange(len(R)), k), R[R >= 0]
+    params = np.full((len(R), len(names)), np.nan)
+    bse = np.full((len(R), len(names)), np.nan)
+    params[rows, columns] = np.concatenate([r[1].ravel() for r in results])
+    bse[rows, columns] = np.concatenate([r[2].ravel() for r in results])
+    ssr = np.concatenate([r[3] for r in results])
+    
+    y_values = D[:, target]
+    tss = ((y_values - y_values.mean())**2).sum() if add_constant else (y_values**2).sum()
+    rsquared = 1 - ssr/tss
+    llf = -nobs/2 * (1 + np.log(2*np.pi) + np.log(ssr/nobs))
+    candidate_names = [name for name in X.columns if name not in always]
+    included = (R[:, None, :] == np.array(candidates)[None, :, None]).any(axis = 2)
+    
+    table = pd.DataFrame({
+        "regressors": [" + ".join(itertools.compress(candidate_names, row)) for row in included],
+        "size": included.sum(axis = 1),
+        "nobs": nobs,
+        "rsquared": rsquared,
+        "rsquared_adj": 1 - (1 - rsquared) * (nobs - add_constant)/(nobs - k),
+        "aic": -2*llf + 2*k,
+        "bic": -2*llf + k*math.log(nobs),
+        "ssr": ssr})
+    table = pd.concat([table, pd.DataFrame(params, columns = names), 
+        pd.DataFrame(bse, columns = [name + "_se" for name in names])], axis = 1)
+    ascending = sort_by in ("aic", "bic", "ssr")
+    return table.sort_values(sort_by, ascending = ascending, kind = "stable").reset_index(drop = True)
+
+
+
 # ----
 #
 # These are statistics functions for Brad DeLong's jupyter notebooks. Should exist 
@@ -0,0 +1,140 @@
+import glob
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from delong_functions.data_functions import data_FREDseries_incremental, getdata_cached
+
+
+@pytest.fixture
+def http_directory(tmp_path):
+    "A stand-in HTTP server for tmp_path/www, which answers If-Modified-Since with 304; yields the directory, its base URL and the status codes sent."
+    directory = tmp_path / "www"
+    directory.mkdir()
+    requests = []
+
+    class handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_response(self, code, message = None):
+            requests.append(code)
+            super().send_response(code, message)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory = str(directory)))
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    yield directory, f"http://127.0.0.1:{server.server_port}/", requests
+    server.shutdown()
+    server.server_close()
+
+
+def write_series(path, periods):
+    pd.DataFrame({"DATE": pd.date_range("2000-01-01", periods = periods, freq = "MS"),
+                  "GDP": range(periods)}).to_csv(path, index = False)
+
+
+def test_incremental_series_refetches_when_the_stored_copy_is_missing(tmp_path):
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    url, cache = source.as_uri(), str(tmp_path / "cache")
+
+    first = data_FREDseries_incremental("GDP", url, revision_window = 5, cache_dir = cache)
+    again = data_FREDseries_incremental("GDP", url, revision_window = 5, cache_dir = cache)
+    assert first["newRows"] == 40 and again["newRows"] == 5
+    pd.testing.assert_frame_equal(first["df"], again["df"])
+
+    for path in glob.glob(os.path.join(cache, "series", "*.pkl")):
+        os.remove(path)
+    rebuilt = data_FREDseries_incremental("GDP", url, revision_window = 5, cache_dir = cache)
+    assert rebuilt["newRows"] == 40
+    pd.testing.assert_frame_equal(first["df"], rebuilt["df"])
+
+
+def test_incremental_series_keeps_stored_rows_when_the_tail_is_empty(tmp_path):
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    url, cache = source.as_uri(), str(tmp_path / "cache")
+    first = data_FREDseries_incremental("GDP", url, revision_window = 5, cache_dir = cache)
+
+    write_series(source, 0)
+    empty = data_FREDseries_incremental("GDP", url, revision_window = 5, cache_dir = cache)
+    assert empty["newRows"] == 0
+    pd.testing.assert_frame_equal(first["df"], empty["df"])
+
+    stored = pd.read_pickle(glob.glob(os.path.join(cache, "series", "*.pkl"))[0])
+    pd.testing.assert_frame_equal(first["df"], stored)
+
+
+def test_incremental_series_with_no_revision_window_fetches_only_new_rows(tmp_path):
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    url, cache = source.as_uri(), str(tmp_path / "cache")
+    first = data_FREDseries_incremental("GDP", url, revision_window = 0, cache_dir = cache)
+    again = data_FREDseries_incremental("GDP", url, revision_window = 0, cache_dir = cache)
+    assert first["newRows"] == 40 and again["newRows"] == 0
+    pd.testing.assert_frame_equal(first["df"], again["df"])
+
+    write_series(source, 42)
+    longer = data_FREDseries_incremental("GDP", url, revision_window = 0, cache_dir = cache)
+    assert longer["newRows"] == 2 and len(longer["df"]) == 42
+    assert longer["lastObservation"] == pd.Timestamp("2003-06-01")
+
+
+def test_cached_read_is_served_from_the_binary_copy(tmp_path):
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    cache = str(tmp_path / "cache")
+    first = getdata_cached(source.as_uri(), cache_dir = cache)
+    assert len(first) == 40
+    assert glob.glob(os.path.join(cache, "objects", "*.csv"))
+    assert glob.glob(os.path.join(cache, "objects", "*-*.p*"))
+
+    # neither the source nor the raw csv file is read again
+    os.remove(source)
+    for path in glob.glob(os.path.join(cache, "objects", "*.csv")):
+        os.remove(path)
+    pd.testing.assert_frame_equal(first, getdata_cached(source.as_uri(), cache_dir = cache))
+
+
+def test_cached_refresh_keeps_the_copy_on_304_or_same_content(tmp_path, http_directory):
+    directory, base_URL, requests = http_directory
+    write_series(directory / "GDP.csv", 40)
+    cache = str(tmp_path / "cache")
+    first = getdata_cached(base_URL + "GDP.csv", cache_dir = cache)
+    objects = sorted(os.listdir(os.path.join(cache, "objects")))
+
+    refreshed = getdata_cached(base_URL + "GDP.csv", refresh = True, cache_dir = cache)
+    assert requests == [200, 304]
+    pd.testing.assert_frame_equal(first, refreshed)
+    assert sorted(os.listdir(os.path.join(cache, "objects"))) == objects
+
+    # same content from a source that sends no validators
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    getdata_cached(source.as_uri(), cache_dir = cache)
+    objects = sorted(os.listdir(os.path.join(cache, "objects")))
+    pd.testing.assert_frame_equal(first, getdata_cached(source.as_uri(), refresh = True, cache_dir = cache))
+    assert sorted(os.listdir(os.path.join(cache, "objects"))) == objects
+
+    write_series(source, 41)
+    assert len(getdata_cached(source.as_uri(), refresh = True, cache_dir = cache)) == 41
+
+
+def test_cached_read_rebuilds_missing_objects(tmp_path):
+    source = tmp_path / "GDP.csv"
+    write_series(source, 40)
+    cache = str(tmp_path / "cache")
+    first = getdata_cached(source.as_uri(), cache_dir = cache)
+
+    for path in glob.glob(os.path.join(cache, "objects", "*-*.p*")):
+        os.remove(path)
+    pd.testing.assert_frame_equal(first, getdata_cached(source.as_uri(), cache_dir = cache))
+
+    for path in glob.glob(os.path.join(cache, "objects", "*")):
+        os.remove(path)
+    pd.testing.assert_frame_equal(first, getdata_cached(source.as_uri(), cache_dir = cache))
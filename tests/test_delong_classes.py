@@ -0,0 +1,66 @@
+import numpy as np
+
+from delong_classes import (_merge_rows, _merge_rows_numpy, _merge_sketches, malthusian, malthusian_batch, malthusian_steady_states,
+    shock, solow, solow_batch)
+
+
+def test_merged_sketches_match_quantiles_of_pooled_draws():
+    rng = np.random.default_rng(0)
+    grid = np.linspace(0, 1, 201)
+    draws = [rng.lognormal(size = (3, size)) for size in (4000, 1000, 2500)]
+    merged, weight = None, 0
+    for block in draws:
+        sketch = {'κ': np.quantile(block, grid, axis = 1).T}
+        merged = _merge_sketches(merged, weight, sketch, block.shape[1], grid)
+        weight += block.shape[1]
+    assert merged['κ'].shape == (3, len(grid))
+    pooled = np.concatenate(draws, axis = 1)
+    for q in (0.05, 0.5, 0.95):
+        exact = np.quantile(pooled, q, axis = 1)
+        estimate = [np.interp(q, grid, row) for row in merged['κ']]
+        np.testing.assert_allclose(estimate, exact, rtol = 0.01)
+
+
+
+def test_merge_rows_match_merging_each_period_with_np_interp():
+    rng = np.random.default_rng(1)
+    grid = np.linspace(0, 1, 101)
+    old = np.quantile(rng.lognormal(size = (50, 3000)), grid, axis = 1).T
+    new = np.quantile(rng.lognormal(0.3, size = (50, 1000)), grid, axis = 1).T
+    expected = np.empty_like(old)
+    for t in range(len(old)):
+        values = np.sort(np.concatenate([old[t], new[t]]))
+        cdf = 0.75*np.interp(values, old[t], grid) + 0.25*np.interp(values, new[t], grid)
+        expected[t] = np.interp(grid, cdf, values)
+    np.testing.assert_allclose(_merge_rows(old, new, 0.25, grid), expected, rtol = 1e-12)
+    np.testing.assert_allclose(_merge_rows_numpy(old, new, 0.25, grid), expected, rtol = 1e-12)
+
+def test_shock_accepts_phi_as_spelled_in_the_constructor():
+    model = malthusian_batch(ϕ = [1, 2])
+    baseline = model.gen_seq(3, 'n')
+    shocked = model.gen_seq(3, 'n', shocks = [shock(1, 'ϕ', 2, how = 'scale')])
+    np.testing.assert_allclose(model.ϕ, [2, 4])
+    np.testing.assert_array_equal(shocked[:, 0], baseline[:, 0])
+    assert (shocked[:, 1:] < baseline[:, 1:]).all()
+
+
+def test_malthusian_steady_state_is_where_a_long_simulation_ends():
+    model = malthusian(h = 0.01, γ = 2)
+    solved = malthusian_steady_states(h = 0.01, γ = 2).iloc[0]
+    run = model.simulate(5000)
+    np.testing.assert_allclose([run['κ'][-1], run['y'][-1], run['E'][-1]],
+                               solved[['κ_star', 'y_star', 'E_star']], rtol = 1e-12)
+    κ, n, y, E = model.steady_state(disp = False)
+    np.testing.assert_allclose([κ, n, y, E], solved[['κ_star', 'n_star', 'y_star', 'E_star']], rtol = 1e-12)
+
+
+def test_solow_batch_matches_solow_for_every_scenario():
+    n, s, δ = [0.0, 0.01, 0.02], [0.15, 0.2, 0.3], 0.04
+    batch = solow_batch(n = n, s = s, δ = δ, α = [[0.3], [0.5]], κ = 2.0).simulate(200)
+    for i in range(6):
+        α = [0.3, 0.5][i // 3]
+        single = solow(n = n[i % 3], s = s[i % 3], δ = δ, α = α, κ = 2.0).simulate(200)
+        for var in ('κ', 'E', 'L'):
+            np.testing.assert_array_equal(batch[var][i], single[var])
+        for var in ('Y', 'K', 'y'):
+            np.testing.assert_array_max_ulp(batch[var][i], single[var].to_numpy(), maxulp = 1)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from delong_functions.inequality_functions import gini, gini_by_group, top_share
+
+
+def test_top_share_below_one_observation_matches_weighted_path():
+    incomes = np.random.default_rng(0).lognormal(size = 1000)
+    top = [0, 0.0005, 0.1]
+    np.testing.assert_allclose(top_share(incomes, top),
+                               top_share(incomes, top, weights = np.ones(1000)))
+    assert top_share(incomes, 0) == 0
+
+
+def test_gini_by_group_in_chunks_matches_gini_of_each_group():
+    rng = np.random.default_rng(0)
+    incomes = rng.lognormal(size = 5000)
+    weights = rng.uniform(0.5, 2, size = 5000)
+    groups = rng.choice(['a', 'b', 'c', 'd'], size = 5000, p = [0.6, 0.3, 0.099, 0.001])
+    for w in (None, weights):
+        # chunks smaller than, and straddling, every group
+        result = gini_by_group(incomes, groups, w, chunk = 7)
+        for label in 'abcd':
+            chosen = groups == label
+            expected = gini(incomes[chosen], None if w is None else w[chosen])
+            assert abs(result[label] - expected) < 1e-12
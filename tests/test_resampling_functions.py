@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from delong_functions.resampling_functions import bootstrap_ols
+
+
+def test_bootstrap_redraws_resamples_that_miss_a_rare_dummy():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'x': rng.normal(size = 60), 'd': 0.0})
+    X.loc[:2, 'd'] = 1
+    y = 1 + X.x + X.d + rng.normal(size = 60)
+
+    for method in ('pairs', 'block'):
+        table, replicates = bootstrap_ols(y, X, 500, method = method, seed = 1, workers = 1,
+                                          return_replicates = True)
+        assert replicates.shape == (500, 3)
+        assert np.isfinite(replicates).all()
+        assert table.notna().all().all()
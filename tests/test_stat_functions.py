@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from delong_functions.stat_functions import rolling_ols, specification_search
+
+
+def test_rolling_ols_break_dummy_leaves_singular_windows_nan():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'u': rng.normal(size = 400)})
+    X['d'] = 0
+    X.loc[200:, 'd'] = 1
+    y = 1 + X.u + X.d + rng.normal(size = 400)
+
+    results = rolling_ols(y, X, window = 50)
+
+    # only windows that straddle the break identify the dummy's coefficient
+    straddling = (X.index >= 200) & (X.index < 249)
+    assert results['params'][straddling].notna().all().all()
+    assert results['params'][~straddling].isna().all().all()
+    assert results['bse'][~straddling].isna().all().all()
+    assert results['rsquared'][~straddling].isna().all()
+
+
+def test_specification_search_collinear_subsets_are_nan():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size = (200, 3)), columns = ['a', 'b', 'c'])
+    X['a2'] = 2 * X.a
+    y = pd.Series(1 + X.a + rng.normal(size = 200))
+
+    table = specification_search(y, X, workers = 1)
+
+    collinear = table.regressors.str.contains('a2') & table.regressors.str.contains(r'\ba\b')
+    assert len(table) == 16
+    assert table.loc[collinear, ['rsquared', 'bic', 'a']].isna().all().all()
+    assert table.loc[~collinear, 'rsquared'].notna().all()
+    assert table.regressors.iloc[0] in ('a', 'a2')
+
+
+def test_specification_search_needs_both_endogenous_and_instruments():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size = (50, 2)), columns = ['a', 'b'])
+    other = pd.DataFrame({'z': rng.normal(size = 50)})
+    y = pd.Series(rng.normal(size = 50))
+    for arguments in ({'instruments': other}, {'endogenous': other}):
+        with pytest.raises(ValueError):
+            specification_search(y, X, workers = 1, **arguments)
+
+
+@pytest.mark.parametrize('window', [30, None])
+@pytest.mark.parametrize('add_constant', [True, False])
+def test_rolling_ols_matches_statsmodels_window_by_window(window, add_constant):
+    sm = pytest.importorskip('statsmodels.api')
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame({'u': rng.normal(size = 120), 'v': 5 + rng.normal(size = 120)})
+    y = 1 + 0.5*X.u - X.v + rng.normal(size = 120)
+    X.loc[40, 'u'] = np.nan
+
+    results = rolling_ols(y, X, window = window, add_constant = add_constant)
+
+    design = sm.add_constant(X) if add_constant else X
+    checked = 0
+    for end in range(len(y)):
+        rows = slice(0 if window is None else end - window + 1, end + 1)
+        if rows.start < 0:
+            assert results['params'].iloc[end].isna().all()
+            continue
+        data = pd.concat([y[rows], design[rows]], axis = 1).dropna()
+        if len(data) <= design.shape[1]:
+            continue
+        fit = sm.OLS(data.iloc[:, 0], data.iloc[:, 1:]).fit()
+        np.testing.assert_allclose(results['params'].iloc[end], fit.params, rtol = 1e-10)
+        np.testing.assert_allclose(results['bse'].iloc[end], fit.bse, rtol = 1e-10)
+        np.testing.assert_allclose(results['rsquared'].iloc[end], fit.rsquared, rtol = 1e-10)
+        assert results['nobs'].iloc[end] == len(data)
+        checked += 1
+    assert checked > 80